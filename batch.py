@@ -0,0 +1,144 @@
+import argparse, json, multiprocessing, os, random, statistics, sys, time
+import main
+from benchmark import SCRIPT, ScriptedKeys
+from code.atlas import prepare_atlas
+from code.mapdata import MapData
+from code.replay import Recording, Replayer
+from code.settings import *
+
+## Keys a random policy picks from, one from each group so it never holds left and right together
+RANDOM_KEYS = [[None, PLAYER_LEFT_KEY, PLAYER_RIGHT_KEY], [None, PLAYER_JUMP_KEY], [None, PLAYER_SHOOT_KEY], [None, None, None, PLAYER_DASH_KEY],
+               [None, None, None, PLAYER_DUCK_KEY], [None, None, None, PLAYER_STRAFE_KEY]]
+
+class ScriptPolicy:
+	# Same phases the benchmark runs through
+	def __init__(self, game, seed):
+		self.keys = ScriptedKeys()
+		game.player.keys = lambda: self.keys
+
+	def sample(self, tick):
+		self.keys.down = SCRIPT[(tick // BENCHMARK_PHASE_TICKS) % len(SCRIPT)]
+	pass
+
+class RandomPolicy:
+	def __init__(self, game, seed):
+		self.rng = random.Random(seed)
+		self.keys = ScriptedKeys()
+		game.player.keys = lambda: self.keys
+
+	def sample(self, tick):
+		if tick % BATCH_POLICY_HOLD_TICKS == 0:
+			self.keys.down = {key for key in (self.rng.choice(group) for group in RANDOM_KEYS) if key is not None}
+	pass
+
+POLICIES = {'script': ScriptPolicy, 'random': RandomPolicy}
+
+def positive_int(value):
+	number = int(value)
+	if number < 1:
+		raise argparse.ArgumentTypeError(f"{value} is not a positive whole number")
+	return number
+
+def run_session(job):
+	# Runs in a worker process, which builds a fresh game per session and keeps the loaded assets between them
+	if job['replay']:
+		# A recording brings its own seed, and there's nothing to play past its end
+		recording = Recording.load(job['replay'])
+		seed = recording.seed
+		ticks = min(job['ticks'], len(recording))
+		game = main.Main(headless = True, map_path = recording.map_path, seed = seed)
+		game.input = Replayer(game, recording)
+		policy = None
+	else:
+		seed = job['seed']
+		ticks = job['ticks']
+		game = main.Main(headless = True, map_path = job['map'], seed = seed)
+		policy = POLICIES[job['policy']](game, seed)
+	kills = deaths = 0
+	win_tick = None
+	alive = game.enemies.alive
+	dead = game.player.dead
+	tick_times = []
+	start = time.perf_counter()
+	for tick in range(ticks):
+		if policy: policy.sample(tick)
+		tick_start = time.perf_counter()
+		game.step()
+		tick_times.append((time.perf_counter() - tick_start) * 1000)
+		## Outcomes, enemies come back whenever the player respawns so kills are counted as they drop
+		kills += max(0, alive - game.enemies.alive)
+		alive = game.enemies.alive
+		if game.player.dead and not dead:
+			deaths += 1
+		dead = game.player.dead
+		if not alive:
+			win_tick = game.ticks
+			break
+	elapsed = time.perf_counter() - start
+	tick_times.sort()
+	# An empty recording plays no ticks at all, which leaves nothing to time
+	return {'seed': seed, 'policy': job['policy'], 'ticks': game.ticks, 'kills': kills, 'deaths': deaths,
+	        'won': win_tick is not None, 'time_to_win': win_tick / TICK_RATE if win_tick is not None else None,
+	        'tick_mean': sum(tick_times) / len(tick_times) if tick_times else None,
+	        'tick_p95': tick_times[int(len(tick_times) * 0.95)] if tick_times else None,
+	        'tick_max': tick_times[-1] if tick_times else None,
+	        'diverged': game.input.diverged if policy is None else None, 'elapsed': elapsed, 'pid': os.getpid()}
+
+def aggregate(results, wall_time):
+	wins = [result['time_to_win'] for result in results if result['won']]
+	ticks = sum(result['ticks'] for result in results)
+	summary = {'sessions': len(results), 'wins': len(wins), 'win_rate': len(wins) / len(results),
+	           'time_to_win_mean': statistics.mean(wins) if wins else None, 'time_to_win_median': statistics.median(wins) if wins else None,
+	           'ticks': ticks, 'wall_time': wall_time, 'ticks_per_second': ticks / wall_time, 'workers': len({result['pid'] for result in results}),
+	           'diverged': sum(result['diverged'] is not None for result in results)}
+	for stat in ['kills', 'deaths', 'tick_mean', 'tick_p95', 'tick_max']:
+		values = [result[stat] for result in results if result[stat] is not None]
+		summary[stat] = {'mean': statistics.mean(values), 'min': min(values), 'max': max(values)} if values else None
+	return summary
+
+def print_summary(summary):
+	print(F"{summary['sessions']} sessions, {summary['ticks']} ticks in {summary['wall_time']:.2f}s over {summary['workers']} workers "
+	      F"({summary['ticks_per_second']:.0f} ticks/s, {summary['ticks_per_second'] / TICK_RATE:.1f}x real time)")
+	win_time = F", mean time to win {summary['time_to_win_mean']:.1f}s" if summary['wins'] else ''
+	print(F"Won {summary['wins']} ({summary['win_rate']:.0%}){win_time}")
+	if summary['diverged']:
+		print(F"Diverged from the recording in {summary['diverged']} of {summary['sessions']} sessions")
+	for stat in ['kills', 'deaths', 'tick_mean', 'tick_p95', 'tick_max']:
+		values = summary[stat]
+		if values is None:
+			continue
+		unit = 'ms' if stat.startswith('tick') else ''
+		print(F"{stat:<12}{values['mean']:>10.3f}{unit} mean{values['min']:>10.3f}{unit} min{values['max']:>10.3f}{unit} max")
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description = "simulate many headless sessions in parallel and aggregate their outcomes")
+	parser.add_argument('--runs', type = positive_int, default = 16, help = "number of sessions")
+	parser.add_argument('--workers', type = positive_int, default = os.cpu_count(), help = "worker processes")
+	parser.add_argument('--ticks', type = positive_int, default = TICK_RATE * 120, help = "tick budget of each session, sessions end early on a win")
+	parser.add_argument('--policy', choices = sorted(POLICIES), default = 'random', help = "what drives the player")
+	parser.add_argument('--replay', help = "play this recording back once instead of running policies, checking it for divergence")
+	parser.add_argument('--map', default = PATHS['map'], help = "tmx map to load")
+	parser.add_argument('--seed', type = int, default = 1, help = "seed of the first session, the others count up from it")
+	parser.add_argument('--json', help = "write every session and the summary to this file")
+	args = parser.parse_args()
+	# A replay always plays out the same way, so it only needs the one session
+	runs = 1 if args.replay else args.runs
+	jobs = [{'seed': args.seed + index, 'policy': 'replay' if args.replay else args.policy, 'replay': args.replay,
+	         'map': args.map, 'ticks': args.ticks} for index in range(runs)]
+	# The compiled map and atlases are built once up front, so the workers only ever read the caches
+	MapData(Recording.load(args.replay).map_path if args.replay else args.map)
+	for name in ['player', 'enemy']:
+		prepare_atlas(PATHS[name])
+	start = time.perf_counter()
+	# Spawned rather than forked, SDL hangs in a forked child
+	with multiprocessing.get_context('spawn').Pool(min(args.workers, len(jobs))) as pool:
+		results = sorted(pool.imap_unordered(run_session, jobs), key = lambda result: result['seed'])
+		# Let the workers run out of jobs and leave, SDL catches the SIGTERM terminate() would send them
+		pool.close()
+		pool.join()
+	summary = aggregate(results, time.perf_counter() - start)
+	print_summary(summary)
+	if args.json:
+		with open(args.json, 'w') as file:
+			json.dump({'summary': summary, 'sessions': results}, file, indent = 2)
+	sys.exit(1 if summary['diverged'] else 0)
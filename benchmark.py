@@ -0,0 +1,204 @@
+import argparse, json, os, random, sys, time
+import xml.etree.ElementTree as ElementTree
+import main
+from code.enemy import Enemy
+from code.particles import BloodParticles
+from code.player import Player
+from code.projectiles import Projectiles
+from code.replay import Recording, Replayer
+from code.resources import RESOURCES
+from code.settings import *
+
+## Scripted input, each phase is held for BENCHMARK_PHASE_TICKS before moving on to the next one
+SCRIPT = [{PLAYER_RIGHT_KEY},
+          {PLAYER_RIGHT_KEY, PLAYER_JUMP_KEY},
+          {PLAYER_RIGHT_KEY, PLAYER_SHOOT_KEY},
+          {PLAYER_LEFT_KEY, PLAYER_DASH_KEY},
+          {PLAYER_LEFT_KEY, PLAYER_JUMP_KEY, PLAYER_SHOOT_KEY},
+          {PLAYER_RIGHT_KEY, PLAYER_JUMP_KEY}]
+PHASES = ['frame', 'update', 'draw', 'player_collision', 'bullets', 'blood']
+
+class ScriptedKeys:
+	def __init__(self):
+		self.down = set()
+
+	def __getitem__(self, key):
+		return key in self.down
+	pass
+
+class Timings:
+	def __init__(self):
+		self.current = dict.fromkeys(PHASES, 0)
+		self.samples = {phase: [] for phase in PHASES}
+		self.recording = False
+
+	def wrap(self, owner, name, phase):
+		# Time every call of owner.name, a phase called several times in a tick adds up
+		method = getattr(owner, name)
+		def timed(*args, **kwargs):
+			start = time.perf_counter()
+			result = method(*args, **kwargs)
+			self.current[phase] += time.perf_counter() - start
+			return result
+		setattr(owner, name, timed)
+
+	def end_tick(self):
+		if self.recording:
+			for phase in PHASES:
+				self.samples[phase].append(self.current[phase] * 1000)
+		self.current = dict.fromkeys(PHASES, 0)
+
+	def report(self):
+		report = {}
+		for phase, samples in self.samples.items():
+			ordered = sorted(samples)
+			percentile = lambda p: ordered[min(len(ordered) - 1, int(len(ordered) * p))] if ordered else 0
+			report[phase] = {'mean': sum(ordered) / len(ordered) if ordered else 0, 'p95': percentile(0.95), 'p99': percentile(0.99)}
+		return report
+	pass
+
+def generate_map(repeat, source = PATHS['map']):
+	# Tile the level side by side repeat times, written next to the other caches
+	tree = ElementTree.parse(source)
+	root = tree.getroot()
+	width = int(root.get('width'))
+	map_width = width * int(root.get('tilewidth'))
+	root.set('width', str(width * repeat))
+	source_folder = os.path.dirname(os.path.abspath(source))
+	for tileset in root.findall('tileset'):
+		tileset.set('source', os.path.relpath(os.path.join(source_folder, tileset.get('source')), os.path.abspath(PATHS['cache'])).replace('\\', '/'))
+	for layer in root.findall('layer'):
+		layer.set('width', str(width * repeat))
+		data = layer.find('data')
+		rows = [row.rstrip(',') for row in data.text.strip().split('\n')]
+		data.text = '\n' + ',\n'.join(','.join([row] * repeat) for row in rows) + '\n'
+	next_id = int(root.get('nextobjectid'))
+	for group in root.findall('objectgroup'):
+		objects = group.findall('object')
+		for copy in range(1, repeat):
+			for obj in objects:
+				# Only one player, the copies just get more enemies and platforms
+				if obj.get('name') == 'Player':
+					continue
+				duplicate = ElementTree.fromstring(ElementTree.tostring(obj))
+				duplicate.set('id', str(next_id))
+				duplicate.set('x', str(float(obj.get('x')) + copy * map_width))
+				next_id += 1
+				group.append(duplicate)
+	root.set('nextobjectid', str(next_id))
+	os.makedirs(PATHS['cache'], exist_ok = True)
+	path = os.path.join(PATHS['cache'], f"benchmark_{repeat}x.tmx")
+	tree.write(path, encoding = 'UTF-8', xml_declaration = True)
+	return path
+
+class Benchmark:
+	def __init__(self, args):
+		random.seed(args.seed)
+		self.args = args
+		self.timings = Timings()
+		self.timings.wrap(main.AllSprites, 'customize_draw', 'draw')
+		self.timings.wrap(main.AllSprites, 'update', 'update')
+		self.timings.wrap(Player, 'collision', 'player_collision')
+		self.timings.wrap(Projectiles, 'update', 'bullets')
+		self.timings.wrap(BloodParticles, 'update', 'blood')
+		self.keys = ScriptedKeys()
+		if args.replay:
+			# A recorded session brings its own map, seed and input instead of the script
+			recording = Recording.load(args.replay)
+			self.game = main.Main(headless = True, map_path = recording.map_path, seed = recording.seed)
+			self.game.input = Replayer(self.game, recording)
+		else:
+			map_path = generate_map(args.repeat, args.map) if args.repeat > 1 else args.map
+			self.game = main.Main(headless = True, map_path = map_path)
+			self.game.player.keys = lambda: self.keys
+		## Extra enemies, spread around the spawns the map already has
+		spawns = [enemy.originalposition for enemy in self.game.enemy_group]
+		for index in range(args.enemies):
+			spawn = spawns[index % len(spawns)]
+			Enemy(animations = self.game.enemy_animations,
+                  pos = (spawn.x + random.uniform(-64, 64), spawn.y),
+                  level_group = self.game.level_group,
+                  groups = (self.game.all_sprites, self.game.enemy_group),
+                  enemy_group = self.game.player_group,
+                  manager = self.game.enemies)
+		## Stress bullets are fired by the benchmark itself, so they're counted apart from the entities' shots
+		self.bullet_image = RESOURCES.image(PATHS['bullet'])
+		self.gib_timer = 0
+		pass
+
+	def spawn_stress(self):
+		view = self.game.all_sprites.view_rect
+		projectiles = self.game.all_sprites.projectiles
+		for _ in range(self.args.bullets - projectiles.count(self)):
+			pos = (random.uniform(view.left, view.right), random.uniform(view.top, view.bottom))
+			projectiles.fire(self, self.bullet_image, pos, (random.choice((-1, 1)), 0), PLAYER_BULLET_SPEED, self.game.enemy_group)
+		self.gib_timer += self.args.gibs * TICK_TIME
+		while self.gib_timer >= 1:
+			self.gib_timer -= 1
+			pos = pygame.Vector2(random.uniform(view.left, view.right), random.uniform(view.top, view.bottom))
+			self.game.all_sprites.blood.emit(self, pos, 50, (200, 0, 0), PARTICLE_CAPACITY, 'benchmark')
+		pass
+
+	def tick(self, index):
+		self.keys.down = SCRIPT[(index // BENCHMARK_PHASE_TICKS) % len(SCRIPT)]
+		start = time.perf_counter()
+		self.spawn_stress()
+		self.game.step()
+		self.game.draw()
+		self.timings.current['frame'] = time.perf_counter() - start
+		self.timings.end_tick()
+
+	def run(self):
+		for index in range(self.args.warmup):
+			self.tick(index)
+		self.timings.recording = True
+		for index in range(self.args.warmup, self.args.warmup + self.args.ticks):
+			self.tick(index)
+		return {'scenario': {'map': self.args.map, 'replay': self.args.replay, 'repeat': self.args.repeat, 'enemies': len(self.game.enemy_group), 'bullets': self.args.bullets,
+		                     'gibs': self.args.gibs, 'ticks': self.args.ticks, 'warmup': self.args.warmup, 'seed': self.args.seed},
+		        'phases': self.timings.report()}
+	pass
+
+def print_report(result, baseline = None, tolerance = 0):
+	# Returns the phases that got slower than the baseline allows
+	regressions = []
+	print(f"{'phase':<18}{'mean':>10}{'p95':>10}{'p99':>10}" + (f"{'baseline p95':>16}{'change':>10}" if baseline else ''))
+	for phase, stats in result['phases'].items():
+		line = f"{phase:<18}{stats['mean']:>8.3f}ms{stats['p95']:>8.3f}ms{stats['p99']:>8.3f}ms"
+		if baseline and phase in baseline['phases']:
+			old = baseline['phases'][phase]['p95']
+			change = (stats['p95'] - old) / old if old else 0
+			regressed = change > tolerance and stats['p95'] - old > BENCHMARK_NOISE_FLOOR
+			line += f"{old:>14.3f}ms{change:>+10.0%}" + ('  REGRESSION' if regressed else '')
+			if regressed:
+				regressions.append(phase)
+		print(line)
+	return regressions
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description = "time the game loop under scripted stress scenarios")
+	parser.add_argument('--map', default = PATHS['map'], help = "tmx map to load")
+	parser.add_argument('--repeat', type = int, default = 1, help = "generate a wider map by repeating the level this many times")
+	parser.add_argument('--enemies', type = int, default = 0, help = "extra enemies spread over the existing spawns")
+	parser.add_argument('--bullets', type = int, default = 0, help = "bullets kept flying around the camera")
+	parser.add_argument('--gibs', type = float, default = 0, help = "gib bursts per second around the camera")
+	parser.add_argument('--ticks', type = int, default = TICK_RATE * 30, help = "number of measured ticks")
+	parser.add_argument('--warmup', type = int, default = TICK_RATE * 2, help = "ticks to run before measuring")
+	parser.add_argument('--seed', type = int, default = 1)
+	parser.add_argument('--replay', help = "drive the game with a recorded session instead of the scripted input")
+	parser.add_argument('--json', help = "write the results to this file")
+	parser.add_argument('--compare', help = "baseline json to compare the p95 of each phase against")
+	parser.add_argument('--tolerance', type = float, default = 0.1, help = "allowed p95 slowdown before it counts as a regression")
+	args = parser.parse_args()
+	result = Benchmark(args).run()
+	baseline = None
+	if args.compare:
+		with open(args.compare) as file:
+			baseline = json.load(file)
+	regressions = print_report(result, baseline, args.tolerance)
+	if args.json:
+		with open(args.json, 'w') as file:
+			json.dump(result, file, indent = 2)
+	if regressions:
+		print(f"Regressed: {', '.join(regressions)}")
+		sys.exit(1)
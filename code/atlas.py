@@ -0,0 +1,68 @@
+import json, os
+import pygame
+from code.resources import RESOURCES
+from code.settings import *
+
+def animation_sources(path):
+    # Each subfolder is one animation, with its frames numbered from 0
+    sources = {}
+    for folder in sorted(os.listdir(path)):
+        folder_path = os.path.join(path, folder)
+        if os.path.isdir(folder_path):
+            frames = sorted(os.listdir(folder_path), key = lambda string: int(string.split('.')[0]))
+            sources[folder] = [f"{folder_path}/{frame}".replace('\\', '/') for frame in frames]
+    return sources
+
+def source_key(sources):
+    keys = []
+    for frames in sources.values():
+        for frame in frames:
+            stat = os.stat(frame)
+            keys.append(f"{frame}:{stat.st_mtime_ns}:{stat.st_size}")
+    return ';'.join(keys)
+
+def build_atlas(sources, image_path):
+    # Shelf pack every frame into rows no wider than ATLAS_MAX_WIDTH
+    frames = {name: [pygame.image.load(frame) for frame in files] for name, files in sources.items()}
+    rects = {name: [] for name in frames}
+    x = y = shelf_height = width = 0
+    for name, surfs in frames.items():
+        for surf in surfs:
+            if x and x + surf.get_width() > ATLAS_MAX_WIDTH:
+                x, y, shelf_height = 0, y + shelf_height, 0
+            rects[name].append([x, y, surf.get_width(), surf.get_height()])
+            x += surf.get_width()
+            width = max(width, x)
+            shelf_height = max(shelf_height, surf.get_height())
+    atlas = pygame.Surface((max(width, 1), max(y + shelf_height, 1)), pygame.SRCALPHA)
+    for name, surfs in frames.items():
+        for surf, rect in zip(surfs, rects[name]):
+            atlas.blit(surf, rect[:2])
+    pygame.image.save(atlas, image_path)
+    return rects
+
+def prepare_atlas(path):
+    # Each animation set is packed into one image that is rebuilt whenever a source frame changes
+    sources = animation_sources(path)
+    key = source_key(sources)
+    name = path.strip('/').replace('/', '_').replace('\\', '_')
+    image_path = os.path.join(PATHS['cache'], 'atlas', name + '.png')
+    index_path = os.path.join(PATHS['cache'], 'atlas', name + '.json')
+    rects = None
+    if os.path.exists(index_path) and os.path.exists(image_path):
+        with open(index_path) as file:
+            index = json.load(file)
+        if index['key'] == key:
+            rects = index['rects']
+    if rects is None:
+        os.makedirs(os.path.dirname(image_path), exist_ok = True)
+        rects = build_atlas(sources, image_path)
+        with open(index_path, 'w') as file:
+            json.dump({'key': key, 'rects': rects}, file)
+    return image_path, rects
+
+def atlas_frames(image_path, rects):
+    return RESOURCES.animations(image_path, rects)
+
+def load_animations(path):
+    return atlas_frames(*prepare_atlas(path))
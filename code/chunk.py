@@ -0,0 +1,79 @@
+import pygame
+from code.settings import *
+
+class ChunkedLayer:
+    def __init__(self, tiles, z, map_width, map_height, chunk_size = CHUNK_SIZE):
+        self.z = z
+        self.chunk_size = chunk_size
+        self.columns = map_width // chunk_size + 1
+        self.rows = map_height // chunk_size + 1
+        self.chunks = {}
+        for x, y, surf in tiles:
+            self.bake((x * surf.get_width(), y * surf.get_height()), surf)
+        self.crop()
+        pass
+
+    def chunk_range(self, rect):
+        left = max(rect.left // self.chunk_size, 0)
+        top = max(rect.top // self.chunk_size, 0)
+        right = min((rect.right - 1) // self.chunk_size, self.columns - 1)
+        bottom = min((rect.bottom - 1) // self.chunk_size, self.rows - 1)
+        return left, top, right, bottom
+
+    def bake(self, pos, surf):
+        # Tiles can straddle chunk borders, so stamp them into every chunk they touch
+        rect = surf.get_rect(topleft = pos)
+        left, top, right, bottom = self.chunk_range(rect)
+        for cy in range(top, bottom + 1):
+            for cx in range(left, right + 1):
+                self.chunk(cx, cy).blit(surf, (rect.x - cx * self.chunk_size, rect.y - cy * self.chunk_size))
+        pass
+
+    def chunk(self, cx, cy):
+        chunk = self.chunks.get((cx, cy))
+        if chunk is None:
+            chunk = self.chunks[(cx, cy)] = (pygame.Surface((self.chunk_size, self.chunk_size), pygame.SRCALPHA).convert_alpha(), (0, 0))
+        return chunk[0]
+
+    def crop(self):
+        # Trim the transparent margins of every chunk so drawing doesn't pay for empty pixels
+        for key, (chunk, _) in list(self.chunks.items()):
+            bounds = chunk.get_bounding_rect()
+            if bounds.width == 0 or bounds.height == 0:
+                del self.chunks[key]
+            else:
+                self.chunks[key] = (chunk.subsurface(bounds).copy(), bounds.topleft)
+        pass
+
+    def draw(self, queue, offset):
+        view = pygame.Rect(int(offset.x), int(offset.y), WINDOW_WIDTH + 1, WINDOW_HEIGHT + 1)
+        left, top, right, bottom = self.chunk_range(view)
+        half = self.chunk_size // 2
+        for cy in range(top, bottom + 1):
+            for cx in range(left, right + 1):
+                chunk = self.chunks.get((cx, cy))
+                if chunk is not None:
+                    surf, (x, y) = chunk
+                    # Match the truncation sprites get from Rect.center so chunks and sprites stay aligned
+                    queue.add(surf, (int(cx * self.chunk_size + half - offset.x) - half + x,
+                                     int(cy * self.chunk_size + half - offset.y) - half + y))
+        pass
+    pass
+
+class DecalLayer(ChunkedLayer):
+    def __init__(self, z, map_width, map_height, chunk_size = CHUNK_SIZE):
+        super().__init__([], z, map_width, map_height, chunk_size)
+        pass
+
+    def stamp(self, color, rect):
+        # Decal chunks are only created where something actually lands, and are never cropped
+        left, top, right, bottom = self.chunk_range(rect)
+        for cy in range(top, bottom + 1):
+            for cx in range(left, right + 1):
+                self.chunk(cx, cy).fill(color, rect.move(-cx * self.chunk_size, -cy * self.chunk_size))
+        pass
+
+    def clear(self):
+        self.chunks = {}
+        pass
+    pass
@@ -1,16 +1,50 @@
 from os import walk
 from types import NoneType
+import numpy as np
 import pygame
 from pygame.math import Vector2
 from code.player import Player
+from code.resources import RESOURCES
 from code.settings import *
 from code.sprite import *
 from code.entity import *
 
 # pyright: reportGeneralTypeIssues=false
 
+class Column:
+    # An enemy attribute stored in the manager's array of the same name, so sprites and the vectorized passes share it
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, enemy, owner = None):
+        if enemy is None:
+            return self
+        return getattr(enemy.manager, self.name)[enemy.index].item()
+
+    def __set__(self, enemy, value):
+        getattr(enemy.manager, self.name)[enemy.index] = value
+    pass
+
 class Enemy(Entity):
-    def __init__(self, animations, pos, level_group, groups, enemy_group):
+    # Updated by the EnemyManager instead of by its groups
+    managed = True
+    ## State the manager works on, everything else stays on the sprite
+    dead = Column()
+    health = Column()
+    attacking = Column()
+    bullet_ready = Column()
+    bullet_shoot_timer = Column()
+    random_turn_timer = Column()
+    random_turn_delay = Column()
+    frame_index = Column()
+    last_frame_index = Column()
+    blinking = Column()
+    blink_timer = Column()
+    animation_speed = Column()
+
+    def __init__(self, animations, pos, level_group, groups, enemy_group, manager):
+        self.manager = manager
+        self.index = manager.add(self)
         super().__init__(animations, pos, level_group, groups, enemy_group)
         ## Animation
         self.animation_speed = ENEMY_ANIMATION_SPEED
@@ -20,101 +54,33 @@ class Enemy(Entity):
         self.bullet_x = 64
         self.bullet_y = -13
         self.bullet_direction_x = 1
-        self.bullet_list = []
         ## Game Logic
         self.health = ENEMY_MAX_HEALTH
         self.blink_period = ENEMY_BLINK_TIME
         self.blink_timer = 0
         self.blinking = False
+        self.blood_decal_key = 'enemy'
         ## AI
-        self.player = self.enemy_group.sprites()[0] # type: ignore
-        self.player: Player
         self.attacking = False
-        self.random_turn_delay_min = ENEMY_TURN_DELAY_MIN
-        self.random_turn_delay_max = ENEMY_TURN_DELAY_MAX
         self.random_turn_delay = randrange(ENEMY_TURN_DELAY_MIN, ENEMY_TURN_DELAY_MAX)
         self.random_turn_timer = 0
         ## Sounds
-        self.sounds['shoot'] = pygame.mixer.Sound("audio/bullet.wav")
-        self.sounds['hit'] = pygame.mixer.Sound("audio/hit.wav")
-        for sound in self.sounds.values():
-            sound: pygame.mixer.Sound
-            sound.set_volume(SOUND_VOLUME)
+        self.sounds['shoot'] = RESOURCES.sound("audio/bullet.wav")
+        self.sounds['hit'] = RESOURCES.sound("audio/hit.wav")
         ## Adjust Position
-        for sprite in level_group.sprites():
-            if sprite.rect.collidepoint(self.rect.midbottom):
-                self.rect.bottom = sprite.rect.top
+        for sprite in level_group.collide_point_all(self.rect.midbottom):
+            self.rect.bottom = sprite.rect.top
         self.originalposition = Vector2(self.rect.center)
+        self.face(1)
+        manager.place(self)
         pass
-    
-    def animation_states(self):
-        pass
-    
-    def face_player(self):
-        if self.player.pos.x - self.pos.x < 0:
-            self.status[0] = 'left'
-            self.bullet_direction_x = -1
-        else:
-            self.status[0] = 'right'
-            self.bullet_direction_x = 1
-        self.bullet_offset = Vector2(self.rect.center) + Vector2(self.bullet_x * self.bullet_direction_x, 
-                                                                self.bullet_y)
-    
-    def check_player_in_sight(self):
-        right = True
-        if self.status[0] == 'left':
-            right = False
-        if self.player.pos.y < self.rect.bottom + 50 and self.player.pos.y > self.rect.top - 50 and not self.player.dead:
-            if (right and self.player.pos.x >= self.pos.x) \
-                or (not right and self.player.pos.x <= self.pos.x):
-                return True
-        return False
-        
-    
-    def logic(self, dt):
-        ## Player Death Check
-        if self.player.dead:
-            self.attacking = False
-        ## Bullet Timer
-        if not self.bullet_ready:
-            if self.bullet_shoot_timer > self.bullet_shoot_delay:
-                self.bullet_ready = True
-            self.bullet_shoot_timer += dt * 1000
-        ## Blink Timer
-        if self.blinking:
-            if self.blink_timer > self.blink_period:
-                self.blinking = False
-            self.blink_timer += dt * 1000
-            self.blink()
-        ## Idle Logic
-        if not self.attacking:
-            ## Random Turn Timer
-            if self.random_turn_timer < self.random_turn_delay:
-                self.random_turn_timer += dt * 1000
-            else:
-                self.random_turn_timer = 0
-                self.random_turn_delay = randrange(ENEMY_TURN_DELAY_MIN, ENEMY_TURN_DELAY_MAX)
-                if self.status[0] == 'left': self.status[0] = 'right'
-                else: self.status[0] = 'left'
-                self.bullet_direction_x *= -1
-                self.bullet_offset = Vector2(self.rect.center) + Vector2(self.bullet_x * self.bullet_direction_x, 
+
+    def face(self, direction):
+        self.status[0] = 'right' if direction > 0 else 'left'
+        self.bullet_direction_x = direction
+        self.bullet_offset = Vector2(self.rect.center) + Vector2(self.bullet_x * self.bullet_direction_x,
                                                                 self.bullet_y)
-        ## Sight Logic
-        if self.pos.distance_to(self.player.pos) <= ENEMY_AGGRO_DISTANCE and self.check_player_in_sight():
-            self.attacking = True
-            
-        ## Attacking Logic
-        if self.attacking and not self.player.dead:
-            if self.pos.distance_to(self.player.pos) > ENEMY_AGGRO_DISTANCE:
-                self.attacking = False
-            self.face_player()
-            self.frame_index = 2
-            self.last_frame_index = -1
-            if self.bullet_ready:
-                self.fire_bullet()
-            
-        pass
-    
+
     def damage(self):
         self.sounds['hit'].play()
         if not self.dead:
@@ -125,8 +91,10 @@ class Enemy(Entity):
             self.blinking = False
             self.die()
         pass
-    
+
     def die(self, pitfall = False):
+        if not self.dead:
+            self.manager.alive -= 1
         super().die()
         self.status[1] = '_dead'
         self.animation_speed *= 1.5
@@ -134,21 +102,219 @@ class Enemy(Entity):
         self.last_frame_index = -1
         self.health = 0
         self.blinking = False
-    
+
     def respawn(self):
+        if self.dead:
+            self.manager.alive += 1
         super().respawn()
         self.status[1] = ''
         self.animation_speed = ENEMY_ANIMATION_SPEED
         self.frame_index = 0
         self.last_frame_index = -1
-        for blood in self.blood_list:
-            blood.kill()
-            self.blood_list = []
+        self.groups()[0].blood.clear(self, self.blood_decal_key)
         self.health = ENEMY_MAX_HEALTH
+        self.manager.place(self)
+        self.groups()[0].grid.move(self)
+        pass
+
+
+class EnemyManager:
+    def __init__(self, animations, player, capacity = ENEMY_CAPACITY):
+        self.player = player
+        self.animations = animations
+        self.sprites = []
+        ## Animations are looked up by facing and death, key = facing right + 2 * dead
+        self.keys = ['left', 'right', 'left_dead', 'right_dead']
+        self.frame_counts = np.array([len(animations[key]) for key in self.keys])
+        ## Packed enemy state, one slot per enemy
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.top = np.zeros(capacity, np.int64)
+        self.bottom = np.zeros(capacity, np.int64)
+        self.facing = np.ones(capacity, np.int8)
+        self.last_status = np.zeros(capacity, np.int8)
+        self.dead = np.zeros(capacity, bool)
+        self.health = np.zeros(capacity, np.int32)
+        self.attacking = np.zeros(capacity, bool)
+        self.bullet_ready = np.zeros(capacity, bool)
+        self.bullet_shoot_timer = np.zeros(capacity)
+        self.random_turn_timer = np.zeros(capacity)
+        self.random_turn_delay = np.zeros(capacity, np.int64)
+        self.frame_index = np.zeros(capacity)
+        self.last_frame_index = np.zeros(capacity)
+        self.blinking = np.zeros(capacity, bool)
+        self.blink_timer = np.zeros(capacity)
+        self.animation_speed = np.zeros(capacity)
+        ## Activation, enemies far from the player sleep and catch up on the time they missed when they wake
+        self.awake = np.zeros(capacity, bool)
+        self.asleep_since = np.zeros(capacity)
+        self.time = 0
+        self.cells = {}
+        self.cell_keys = []
+        ## Counters
+        self.alive = 0
+        self.awake_count = 0
+        pass
+
+    def __len__(self):
+        return len(self.sprites)
+
+    def add(self, enemy):
+        if len(self.sprites) == len(self.x):
+            for name in ['x', 'y', 'top', 'bottom', 'facing', 'last_status', 'dead', 'health', 'attacking', 'bullet_ready', 'bullet_shoot_timer',
+                         'random_turn_timer', 'random_turn_delay', 'frame_index', 'last_frame_index', 'blinking', 'blink_timer', 'animation_speed',
+                         'awake', 'asleep_since']:
+                old = getattr(self, name)
+                new = np.zeros(len(old) * 2, old.dtype)
+                new[:len(old)] = old
+                setattr(self, name, new)
+        self.sprites.append(enemy)
+        self.cell_keys.append(None)
+        index = len(self.sprites) - 1
+        # Every entity starts out alive, asleep and on its 'right' animation
+        self.last_status[index] = self.keys.index('right')
+        self.awake[index] = False
+        self.asleep_since[index] = self.time
+        self.alive += 1
+        return index
+
+    def place(self, enemy):
+        # Called whenever an enemy moves, which is only ever on spawn and respawn
+        index = enemy.index
+        self.x[index], self.y[index] = enemy.pos
+        self.top[index], self.bottom[index] = enemy.rect.top, enemy.rect.bottom
+        self.facing[index] = enemy.bullet_direction_x
+        ## Activation cell
+        key = (int(self.x[index]) // SPATIAL_CELL_SIZE, int(self.y[index]) // SPATIAL_CELL_SIZE)
+        if key != self.cell_keys[index]:
+            if self.cell_keys[index] is not None:
+                self.cells[self.cell_keys[index]].remove(index)
+            self.cells.setdefault(key, []).append(index)
+            self.cell_keys[index] = key
+        pass
+
+    def stats(self):
+        return {'alive': self.alive, 'awake': self.awake_count, 'asleep': len(self.sprites) - self.awake_count}
+
+    def activate(self, count):
+        # Only enemies in the cells around the player are awake, the region is wider than the screen and the aggro range
+        region = pygame.Rect(0, 0, WINDOW_WIDTH + ENEMY_ACTIVATION_MARGIN * 2, WINDOW_HEIGHT + ENEMY_ACTIVATION_MARGIN * 2)
+        region.center = self.player.rect.center
+        awake = np.zeros(count, bool)
+        for cy in range(region.top // SPATIAL_CELL_SIZE, (region.bottom - 1) // SPATIAL_CELL_SIZE + 1):
+            for cx in range(region.left // SPATIAL_CELL_SIZE, (region.right - 1) // SPATIAL_CELL_SIZE + 1):
+                cell = self.cells.get((cx, cy))
+                if cell:
+                    awake[cell] = True
+        was_awake = self.awake[:count]
+        self.asleep_since[:count][was_awake & ~awake] = self.time
+        woken = np.flatnonzero(awake & ~was_awake)
+        if len(woken):
+            self.catch_up(woken)
+        self.awake[:count] = awake
+        self.awake_count = int(np.count_nonzero(awake))
+        return awake
+
+    def catch_up(self, indices):
+        # Run the timers forward by however long each enemy slept, anything overdue happens on this tick's passes
+        elapsed = self.time - self.asleep_since[indices]
+        alive = ~self.dead[indices]
+        reloading = alive & ~self.bullet_ready[indices]
+        self.bullet_shoot_timer[indices[reloading]] += elapsed[reloading] * 1000
+        idle = alive & ~self.attacking[indices]
+        self.random_turn_timer[indices[idle]] += elapsed[idle] * 1000
+        blinking = alive & self.blinking[indices]
+        self.blink_timer[indices[blinking]] += elapsed[blinking] * 1000
+        ## Animations carry on looping, or stop on their last frame once dead
+        status = (self.facing[indices] > 0) + self.dead[indices] * 2
+        frame_count = self.frame_counts[status]
+        frame_index = self.frame_index[indices] + self.animation_speed[indices] * elapsed
+        self.frame_index[indices] = np.where(alive, frame_index % frame_count, np.minimum(frame_index, frame_count - 1))
+        self.last_frame_index[indices] = -1
+        pass
+
+    def turn(self, index, direction):
+        self.facing[index] = direction
+        self.sprites[index].face(direction)
+
+    def animate(self, count, awake, dt):
+        frame_index = self.frame_index[:count]
+        last_frame_index = self.last_frame_index[:count]
+        dead = self.dead[:count]
+        status = (self.facing[:count] > 0) + dead * 2
+        frame_index[awake] += self.animation_speed[:count][awake] * dt
+        frame_count = self.frame_counts[status]
+        looped = awake & (frame_index >= frame_count)
+        # Dead enemies hold their last frame, everyone else loops
+        held = looped & dead
+        frame_index[held] = frame_count[held] - 1
+        last_frame_index[held] = frame_index[held] - 1
+        restarted = looped & ~dead
+        frame_index[restarted] = 0
+        last_frame_index[restarted] = -1
+        ## Only touch the sprites that are actually on a new frame
+        changed = awake & ((np.trunc(frame_index) != np.trunc(last_frame_index)) | (status != self.last_status[:count]))
+        for index in np.flatnonzero(changed).tolist():
+            enemy = self.sprites[index]
+            key = self.keys[status[index]]
+            frame = int(frame_index[index])
+            enemy.image = self.animations[key][frame]
+            enemy.frame_key = (key, frame)
+            last_frame_index[index] = frame
+        self.last_status[:count][awake] = status[awake]
         pass
 
     def update(self, dt):
-        self.animate(dt)
-        if not self.dead:
-            self.logic(dt)
-        pass
\ No newline at end of file
+        count = len(self.sprites)
+        if not count:
+            return
+        awake = self.activate(count)
+        self.time += dt
+        self.animate(count, awake, dt)
+        player = self.player
+        alive = awake & ~self.dead[:count]
+        attacking = self.attacking[:count]
+        facing = self.facing[:count]
+        ## Player Death Check
+        if player.dead:
+            attacking[alive] = False
+        ## Bullet Timer
+        reloading = alive & ~self.bullet_ready[:count]
+        self.bullet_ready[:count][reloading & (self.bullet_shoot_timer[:count] > ENEMY_BULLET_DELAY)] = True
+        self.bullet_shoot_timer[:count][reloading] += dt * 1000
+        ## Blink Timer
+        for index in np.flatnonzero(alive & self.blinking[:count]).tolist():
+            if self.blink_timer[index] > ENEMY_BLINK_TIME:
+                self.blinking[index] = False
+            self.blink_timer[index] += dt * 1000
+            self.sprites[index].blink()
+        ## Idle Logic, turning around at random
+        idle = alive & ~attacking
+        waiting = self.random_turn_timer[:count] < self.random_turn_delay[:count]
+        self.random_turn_timer[:count][idle & waiting] += dt * 1000
+        for index in np.flatnonzero(idle & ~waiting).tolist():
+            self.random_turn_timer[index] = 0
+            self.random_turn_delay[index] = randrange(ENEMY_TURN_DELAY_MIN, ENEMY_TURN_DELAY_MAX)
+            self.turn(index, -facing[index])
+        ## Sight Logic
+        dx = self.x[:count] - player.pos.x
+        dy = self.y[:count] - player.pos.y
+        distance = np.sqrt(dx * dx + dy * dy)
+        in_sight = (player.pos.y < self.bottom[:count] + 50) & (player.pos.y > self.top[:count] - 50) & \
+                   (((facing > 0) & (player.pos.x >= self.x[:count])) | ((facing < 0) & (player.pos.x <= self.x[:count])))
+        if not player.dead:
+            attacking[alive & (distance <= ENEMY_AGGRO_DISTANCE) & in_sight] = True
+        ## Attacking Logic
+        if player.dead:
+            return
+        engaged = alive & attacking
+        attacking[engaged & (distance > ENEMY_AGGRO_DISTANCE)] = False
+        facing_player = np.where(player.pos.x - self.x[:count] < 0, -1, 1)
+        for index in np.flatnonzero(engaged & (facing != facing_player)).tolist():
+            self.turn(index, facing_player[index])
+        self.frame_index[:count][engaged] = 2
+        self.last_frame_index[:count][engaged] = -1
+        for index in np.flatnonzero(engaged & self.bullet_ready[:count]).tolist():
+            self.sprites[index].fire_bullet()
+        pass
+    pass
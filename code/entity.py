@@ -3,9 +3,28 @@ from os import walk
 from types import NoneType
 import pygame
 from pygame.math import Vector2
+from code.resources import RESOURCES
 from code.settings import *
 from code.sprite import *
 
+## Tinted copies of every animation frame, built once per animation set
+BLINK_FRAMES = {}
+
+def blink_frames(animations):
+    cached = BLINK_FRAMES.get(id(animations))
+    if cached is None or cached[0] is not animations:
+        variants = {}
+        for key, frames in animations.items():
+            variants[key] = []
+            for frame in frames:
+                white_surf = pygame.mask.from_surface(frame).to_surface(setcolor=(150, 150, 150))
+                white_surf.set_colorkey((0, 0, 0))
+                dark_surf = frame.copy()
+                dark_surf.fill((100, 100, 100), special_flags = pygame.BLEND_RGB_MULT)
+                variants[key].append((white_surf, dark_surf))
+        cached = BLINK_FRAMES[id(animations)] = (animations, variants)
+    return cached[1]
+
 class Entity(pygame.sprite.Sprite):
     def __init__(self, animations, pos, level_group, groups, enemy_group = None):
         super().__init__(groups)
@@ -13,6 +32,8 @@ class Entity(pygame.sprite.Sprite):
         self.animations = animations
         self.status = ['right', '']
         self.image = self.animations[''.join(self.status)][0]
+        self.frame_key = (''.join(self.status), 0)
+        self.blink_frames = blink_frames(self.animations)
         self.rect = self.image.get_rect(midtop = pos)
         self.z = LAYERS['main']
         self.frame_index = 0
@@ -26,9 +47,9 @@ class Entity(pygame.sprite.Sprite):
         self.direction = Vector2()
         ## Bullet Logic
         self.enemy_group = enemy_group
-        self.fire_images = [pygame.image.load(f"{PATHS['fire']}/0.png"),
-                            pygame.image.load(f"{PATHS['fire']}/1.png")]
-        self.bullet_image = pygame.image.load(PATHS['bullet']).convert_alpha()
+        self.fire_images = [RESOURCES.image(f"{PATHS['fire']}/0.png"),
+                            RESOURCES.image(f"{PATHS['fire']}/1.png")]
+        self.bullet_image = RESOURCES.image(PATHS['bullet'])
         self.bullet_speed = 0
         self.bullet_shoot_timer = 0
         self.bullet_shoot_delay = 0
@@ -39,16 +60,13 @@ class Entity(pygame.sprite.Sprite):
         self.bullet_scale = 1
         self.bullet_offset = Vector2(self.rect.center) + Vector2(self.bullet_x * self.bullet_direction_x, 
                                                                 self.bullet_y)
-        self.bullet_list = []
         ## Game Logic
         self.dt = 0
         #self.bloodsurface = pygame.image.load("graphics/blood.png").convert_alpha()
         self.dead = False
         self.health = 1
-        self.blood_list = []
         self.blood_color = (200, 0, 0)
-        self.blood_particle = pygame.surface.Surface((12, 12))
-        self.blood_particle.fill(self.blood_color)
+        self.blood_decal_key = 'entity'
         self.vulnerable = True
         self.blood_gib_count = 50
         self.max_blood = self.blood_gib_count * 1
@@ -56,21 +74,16 @@ class Entity(pygame.sprite.Sprite):
         self.level_group = level_group
         ## Sounds
         self.sounds = {}
-        self.sounds['gib'] = pygame.mixer.Sound("audio/bodysplat.wav")
-        self.sounds['shoot'] = pygame.mixer.Sound("audio/bullet.wav")
-        for sound in self.sounds.values():
-            sound: pygame.mixer.Sound
-            sound.set_volume(SOUND_VOLUME)
+        self.sounds['gib'] = RESOURCES.sound("audio/bodysplat.wav")
+        self.sounds['shoot'] = RESOURCES.sound("audio/bullet.wav")
             
     def fire_bullet(self):
         self.bullet_ready = False
         self.bullet_shoot_timer = 0
         self.sounds['shoot'].play()
-        FireAnimation(self, self.fire_images, self.bullet_direction_x, self.groups()[0])
-        self.bullet_list.append(Bullet(self.bullet_image, self.bullet_offset, Vector2(self.bullet_direction_x, 0), self.bullet_speed, self.groups()[0], self.level_group, self.enemy_group, self.bullet_scale))
-        if len(self.bullet_list) > 10:
-            self.bullet_list[0].kill()
-            self.bullet_list.pop(0)
+        group = self.groups()[0]
+        group.flashes.flash(self, self.fire_images, self.bullet_direction_x)
+        group.projectiles.fire(self, self.bullet_image, self.bullet_offset, (self.bullet_direction_x, 0), self.bullet_speed, self.enemy_group)
         pass
     
     def animation_states(self):
@@ -82,25 +95,14 @@ class Entity(pygame.sprite.Sprite):
     def blink(self):
         self.last_frame_index = -1
         dt = pygame.time.get_ticks() / 25
-        mask = pygame.mask.from_surface(self.image) # type: ignore
-        white_surf = mask.to_surface(setcolor=(150, 150, 150))
-        white_surf.set_colorkey((0, 0, 0))
-        if (sin(dt) >= 0):
-            self.image = white_surf
-        else:
-            white_surf.fill((100, 100, 100))
-            new_image = self.image.copy()
-            new_image.blit(white_surf, (0, 0), special_flags = pygame.BLEND_RGBA_MULT)
-            self.image = new_image
+        key, index = self.frame_key
+        white_surf, dark_surf = self.blink_frames[key][index]
+        self.image = white_surf if sin(dt) >= 0 else dark_surf
 
 
     
     def die(self):
-        for i in range(self.blood_gib_count):
-            self.blood_list.append(BloodParticle(self.blood_particle, self.pos, self.groups()[0], self.level_group))
-            if len(self.blood_list) > self.max_blood:
-                self.blood_list[0].kill()
-                del(self.blood_list[0])
+        self.groups()[0].blood.emit(self, self.pos, self.blood_gib_count, self.blood_color, self.max_blood, self.blood_decal_key)
         self.dead = True
     
     def respawn(self):
@@ -132,6 +134,7 @@ class Entity(pygame.sprite.Sprite):
         # Only change image if we're actually on the next frame
         if (int(self.frame_index) != int(self.last_frame_index) or ''.join(self.status) != self.last_status):
             self.image = self.animations[''.join(self.status)][int(self.frame_index)]
+            self.frame_key = (''.join(self.status), int(self.frame_index))
             self.last_frame_index = int(self.frame_index)
             self.last_status = ''.join(self.status)
         pass
\ No newline at end of file
@@ -0,0 +1,190 @@
+import numpy as np
+import pygame
+from code.masks import MASKS
+from code.settings import *
+from code.tile import MovingPlatform
+
+def merge_solid_tiles(solid, columns, rows):
+    # Greedily grow each unclaimed solid tile into the widest run, then down while whole rows match
+    claimed = [False] * (columns * rows)
+    rects = []
+    for y in range(rows):
+        x = 0
+        while x < columns:
+            index = y * columns + x
+            if not solid[index] or claimed[index]:
+                x += 1
+                continue
+            width = 1
+            while x + width < columns and solid[index + width] and not claimed[index + width]:
+                width += 1
+            height = 1
+            while y + height < rows and all(solid[(y + height) * columns + x + i] and not claimed[(y + height) * columns + x + i] for i in range(width)):
+                height += 1
+            for row in range(y, y + height):
+                for column in range(x, x + width):
+                    claimed[row * columns + column] = True
+            rects.append((x, y, width, height))
+            x += width
+    return rects
+
+class Solid:
+    def __init__(self, rect):
+        self.rect = rect
+        self.hitbox = rect.copy()
+        self.prev_hitbox = rect.copy()
+        pass
+    pass
+
+class LevelGroup(pygame.sprite.Group):
+    def __init__(self, columns, rows, tile_width, tile_height):
+        super().__init__()
+        self.columns = columns
+        self.rows = rows
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        ## Static tiles live in a dense grid keyed by tile coordinates, moving bodies are checked directly
+        self.cells = [None] * (columns * rows)
+        self.dynamic = []
+        self.pending = []
+        ## Merged collision rects, kept apart from the visual tiles
+        self.solids = []
+        self.solid_cells = [None] * (columns * rows)
+        ## Coarse solidity map shared by everything that collides in batches, built on first use
+        self.collision_bitmap = None
+        pass
+
+    def set_solids(self, rects):
+        self.solids = []
+        self.solid_cells = [None] * (self.columns * self.rows)
+        for x, y, width, height in rects:
+            solid = Solid(pygame.Rect(x * self.tile_width, y * self.tile_height, width * self.tile_width, height * self.tile_height))
+            self.solids.append(solid)
+            for row in range(y, y + height):
+                for column in range(x, x + width):
+                    self.solid_cells[row * self.columns + column] = solid
+        pass
+
+    def add_internal(self, sprite, layer = None):
+        super().add_internal(sprite, layer)
+        if isinstance(sprite, MovingPlatform):
+            self.dynamic.append(sprite)
+        else:
+            # Tiles join the group before they have a rect, so they get placed on the next query
+            self.pending.append(sprite)
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        if sprite in self.dynamic:
+            self.dynamic.remove(sprite)
+        elif sprite in self.pending:
+            self.pending.remove(sprite)
+        else:
+            for index in self.cell_indices(sprite.rect):
+                if self.cells[index] and sprite in self.cells[index]:
+                    self.cells[index].remove(sprite)
+
+    def place_pending(self):
+        for sprite in self.pending:
+            for index in self.cell_indices(sprite.rect):
+                if self.cells[index] is None:
+                    self.cells[index] = []
+                self.cells[index].append(sprite)
+        self.pending = []
+
+    def cell_indices(self, rect):
+        left = max(rect.left // self.tile_width, 0)
+        top = max(rect.top // self.tile_height, 0)
+        right = min((rect.right - 1) // self.tile_width, self.columns - 1)
+        bottom = min((rect.bottom - 1) // self.tile_height, self.rows - 1)
+        for y in range(top, bottom + 1):
+            for x in range(left, right + 1):
+                yield y * self.columns + x
+
+    def collide_rect_all(self, rect):
+        if self.pending: self.place_pending()
+        collisions = []
+        for index in self.cell_indices(rect):
+            cell = self.cells[index]
+            if cell:
+                for sprite in cell:
+                    if sprite not in collisions and rect.colliderect(sprite.rect):
+                        collisions.append(sprite)
+        for sprite in self.dynamic:
+            if rect.colliderect(sprite.rect):
+                collisions.append(sprite)
+        return collisions
+
+    def collide_solids(self, rect):
+        collisions = []
+        for index in self.cell_indices(rect):
+            solid = self.solid_cells[index]
+            if solid and solid not in collisions and rect.colliderect(solid.rect):
+                collisions.append(solid)
+        for sprite in self.dynamic:
+            if rect.colliderect(sprite.rect):
+                collisions.append(sprite)
+        return collisions
+
+    def collide_point_all(self, point):
+        return [sprite for sprite in self.collide_rect_all(pygame.Rect(point, (1, 1))) if sprite.rect.collidepoint(point)]
+
+    def collide_any(self, sprite):
+        if self.pending: self.place_pending()
+        for index in self.cell_indices(sprite.rect):
+            cell = self.cells[index]
+            if cell:
+                for level_sprite in cell:
+                    if sprite.rect.colliderect(level_sprite.rect):
+                        return level_sprite
+        for level_sprite in self.dynamic:
+            if sprite.rect.colliderect(level_sprite.rect):
+                return level_sprite
+        return None
+
+    def build_collision_bitmap(self):
+        # Coarse solidity map of the level built from the tile masks, summed so any rect can be tested in O(1)
+        resolution = PARTICLE_COLLISION_RESOLUTION
+        width = self.columns * self.tile_width // resolution
+        height = self.rows * self.tile_height // resolution
+        solid = np.zeros((height, width), bool)
+        for tile in self.sprites():
+            if tile in self.dynamic:
+                continue
+            mask, bounds, opaque = MASKS.entry(tile.image)
+            left, top = tile.rect.x // resolution, tile.rect.y // resolution
+            if opaque:
+                solid[top:top + tile.rect.height // resolution, left:left + tile.rect.width // resolution] = True
+            else:
+                pixels = pygame.surfarray.array_red(mask.to_surface()).T > 0
+                blocks_y, blocks_x = pixels.shape[0] // resolution, pixels.shape[1] // resolution
+                blocks = pixels[:blocks_y * resolution, :blocks_x * resolution].reshape(blocks_y, resolution, blocks_x, resolution).any(axis = (1, 3))
+                solid[top:top + blocks_y, left:left + blocks_x] |= blocks[:height - top, :width - left]
+        self.collision_bitmap = np.zeros((height + 1, width + 1), np.int32)
+        self.collision_bitmap[1:, 1:] = solid.cumsum(0).cumsum(1)
+        pass
+
+    def hits_solid(self, left, top, width, height):
+        # Which of the rects given as arrays touch static level geometry, moving platforms are left to the caller
+        if self.collision_bitmap is None:
+            self.build_collision_bitmap()
+        resolution = PARTICLE_COLLISION_RESOLUTION
+        rows, columns = self.collision_bitmap.shape[0] - 1, self.collision_bitmap.shape[1] - 1
+        x1 = np.clip(left // resolution, 0, columns)
+        y1 = np.clip(top // resolution, 0, rows)
+        x2 = np.clip((left + width - 1) // resolution + 1, 0, columns)
+        y2 = np.clip((top + height - 1) // resolution + 1, 0, rows)
+        bitmap = self.collision_bitmap
+        total = bitmap[y2, x2] - bitmap[y1, x2] - bitmap[y2, x1] + bitmap[y1, x1]
+        return (total > 0) & (x2 > x1) & (y2 > y1)
+
+    def draw_debug(self, display_surface, offset):
+        view = pygame.Rect(int(offset.x), int(offset.y), WINDOW_WIDTH, WINDOW_HEIGHT)
+        for solid in self.solids:
+            if solid.rect.colliderect(view):
+                pygame.draw.rect(display_surface, 'green', solid.rect.move(-view.x, -view.y), 2)
+        for sprite in self.dynamic:
+            if sprite.rect.colliderect(view):
+                pygame.draw.rect(display_surface, 'yellow', sprite.rect.move(-view.x, -view.y), 2)
+        pass
+    pass
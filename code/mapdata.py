@@ -0,0 +1,114 @@
+import hashlib, json, os
+import xml.etree.ElementTree as ElementTree
+import numpy as np
+import pygame
+import pytmx
+from code.level import merge_solid_tiles
+from code.resources import RESOURCES
+from code.settings import *
+
+TILE_LAYERS = ['BG', 'BG Detail', 'Level', 'FG Detail Bottom', 'FG Detail Top']
+
+def source_key(sources):
+    keys = []
+    for source in sources:
+        try:
+            stat = os.stat(source)
+        except OSError:
+            # A source that moved or went away can't match, so the map gets compiled again
+            return None
+        keys.append(f"{source}:{stat.st_mtime_ns}:{stat.st_size}")
+    return ';'.join(keys)
+
+def compile_map(map_path, compiled_path):
+    # Everything the level needs out of the tmx, so the game never has to parse it again until it changes
+    tmx_data = pytmx.TiledMap(map_path)
+    folder = os.path.dirname(map_path)
+    sources = [map_path] + [os.path.join(folder, tileset.get('source')) for tileset in ElementTree.parse(map_path).getroot().findall('tileset') if tileset.get('source')]
+    images = [None]
+    for image in tmx_data.images[1:]:
+        if image is None:
+            images.append(None)
+        else:
+            path, rect, flags = image
+            images.append([os.path.normpath(path).replace('\\', '/'), rect, [bool(flag) for flag in flags] if flags and any(flags) else None])
+    meta = {'key': source_key(sources), 'sources': sources,
+            'width': tmx_data.width, 'height': tmx_data.height, 'tile_width': tmx_data.tilewidth, 'tile_height': tmx_data.tileheight,
+            'images': images, 'platforms': [], 'borders': [], 'player': None, 'enemies': []}
+    for obj in tmx_data.get_layer_by_name('Platforms'):
+        if obj.name == 'Platform':
+            meta['platforms'].append([obj.x, obj.y, obj.gid])
+        else:
+            meta['borders'].append([obj.x, obj.y, obj.width, obj.height])
+    for obj in tmx_data.get_layer_by_name('Entities'):
+        if obj.name == 'Player':
+            meta['player'] = [obj.x, obj.y]
+        if obj.name == 'Enemy':
+            meta['enemies'].append([obj.x, obj.y])
+    layers = {name: np.array(tmx_data.get_layer_by_name(name).data, np.uint16) for name in TILE_LAYERS}
+    solids = merge_solid_tiles((layers['Level'] != 0).ravel().tolist(), tmx_data.width, tmx_data.height)
+    os.makedirs(os.path.dirname(compiled_path), exist_ok = True)
+    with open(compiled_path, 'wb') as file:
+        np.savez(file, meta = np.frombuffer(json.dumps(meta).encode(), np.uint8), solids = np.array(solids, np.int32).reshape(-1, 4),
+                 **{f"layer {name}": data for name, data in layers.items()})
+    pass
+
+class MapData:
+    def __init__(self, map_path):
+        # Compiled next to the other caches and rebuilt whenever the tmx or one of its tilesets changes,
+        # named after the full path too so two maps that share a filename don't share a cache
+        full_path = os.path.abspath(map_path)
+        compiled_path = os.path.join(PATHS['cache'], f"{os.path.basename(map_path)}.{hashlib.sha1(full_path.encode()).hexdigest()[:8]}.npz")
+        data = self.read(compiled_path)
+        if data is None or os.path.abspath(data['meta']['sources'][0]) != full_path or source_key(data['meta']['sources']) != data['meta']['key']:
+            compile_map(map_path, compiled_path)
+            data = self.read(compiled_path)
+        meta = data['meta']
+        self.key = meta['key']
+        self.width = meta['width']
+        self.height = meta['height']
+        self.tile_width = meta['tile_width']
+        self.tile_height = meta['tile_height']
+        self.platforms = meta['platforms']
+        self.borders = meta['borders']
+        self.player = tuple(meta['player'])
+        self.enemies = [tuple(pos) for pos in meta['enemies']]
+        self.solids = [tuple(rect) for rect in data['solids'].tolist()]
+        self.layers = data['layers']
+        self.image_sources = meta['images']
+        self.images = {}
+        pass
+
+    def read(self, compiled_path):
+        if not os.path.exists(compiled_path):
+            return None
+        with np.load(compiled_path) as file:
+            return {'meta': json.loads(file['meta'].tobytes()),
+                    'solids': file['solids'],
+                    'layers': {name: file[f"layer {name}"] for name in TILE_LAYERS}}
+
+    def image(self, gid):
+        surf = self.images.get(gid)
+        if surf is None:
+            path, rect, flags = self.image_sources[gid]
+            surf = RESOURCES.image(path)
+            if rect:
+                surf = surf.subsurface(rect)
+            # Same flip handling as pytmx, diagonal first
+            if flags:
+                horizontal, vertical, diagonal = flags
+                if diagonal:
+                    surf = pygame.transform.flip(pygame.transform.rotate(surf, 270), True, False)
+                if horizontal or vertical:
+                    surf = pygame.transform.flip(surf, horizontal, vertical)
+            self.images[gid] = surf
+        return surf
+
+    def image_paths(self):
+        return sorted({source[0] for source in self.image_sources if source})
+
+    def tiles(self, layer):
+        data = self.layers[layer]
+        for y, x in zip(*np.nonzero(data)):
+            yield int(x), int(y), self.image(int(data[y, x]))
+    pass
@@ -0,0 +1,81 @@
+from weakref import WeakKeyDictionary
+import pygame
+from code.settings import *
+
+class MaskCache:
+    def __init__(self):
+        ## Everything is keyed by the surface object itself, so entries go away with their surfaces
+        self.masks = WeakKeyDictionary()
+        self.flipped = WeakKeyDictionary()
+        self.scaled = WeakKeyDictionary()
+        self.hits = {'mask': 0, 'flip': 0, 'scale': 0}
+        self.misses = {'mask': 0, 'flip': 0, 'scale': 0}
+        self.fast_path = 0
+        pass
+
+    def entry(self, surface):
+        entry = self.masks.get(surface)
+        if entry is None:
+            self.misses['mask'] += 1
+            mask = pygame.mask.from_surface(surface)
+            bounds = mask.get_bounding_rects()
+            bounds = bounds[0].unionall(bounds[1:]) if bounds else pygame.Rect(0, 0, 0, 0)
+            opaque = mask.count() == surface.get_width() * surface.get_height()
+            entry = self.masks[surface] = (mask, bounds, opaque)
+        else:
+            self.hits['mask'] += 1
+        return entry
+
+    def get(self, surface):
+        return self.entry(surface)[0]
+
+    def flip(self, surface, flip_x, flip_y = False):
+        variants = self.flipped.get(surface)
+        if variants is None:
+            variants = self.flipped[surface] = {}
+        variant = variants.get((flip_x, flip_y))
+        if variant is None:
+            self.misses['flip'] += 1
+            variant = variants[(flip_x, flip_y)] = pygame.transform.flip(surface, flip_x, flip_y)
+        else:
+            self.hits['flip'] += 1
+        return variant
+
+    def scale(self, surface, size):
+        size = (int(size[0]), int(size[1]))
+        variants = self.scaled.get(surface)
+        if variants is None:
+            variants = self.scaled[surface] = {}
+        variant = variants.get(size)
+        if variant is None:
+            self.misses['scale'] += 1
+            variant = variants[size] = pygame.transform.scale(surface, size)
+        else:
+            self.hits['scale'] += 1
+        return variant
+
+    def hit_rate(self, kind):
+        total = self.hits[kind] + self.misses[kind]
+        return self.hits[kind] / total if total else 1.0
+
+    def stats(self):
+        return {kind: {'hits': self.hits[kind], 'misses': self.misses[kind], 'hit_rate': self.hit_rate(kind)} for kind in self.hits} \
+            | {'fast_path': self.fast_path}
+    pass
+
+MASKS = MaskCache()
+
+def collide_mask(left, right):
+    return overlap_mask(left.image, left.rect, right.image, right.rect)
+
+def overlap_mask(left_image, left_rect, right_image, right_rect):
+    # Fully opaque surfaces collide wherever the other sprite's visible pixels overlap their rect
+    left_mask, left_bounds, left_opaque = MASKS.entry(left_image)
+    right_mask, right_bounds, right_opaque = MASKS.entry(right_image)
+    if right_opaque:
+        MASKS.fast_path += 1
+        return left_bounds.move(left_rect.topleft).colliderect(right_rect)
+    if left_opaque:
+        MASKS.fast_path += 1
+        return right_bounds.move(right_rect.topleft).colliderect(left_rect)
+    return left_mask.overlap(right_mask, (right_rect.x - left_rect.x, right_rect.y - left_rect.y))
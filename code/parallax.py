@@ -0,0 +1,55 @@
+from math import floor
+import pygame
+from code.settings import *
+
+class ParallaxLayer:
+    def __init__(self, surface, origin, distance, band_height = PARALLAX_BAND_HEIGHT):
+        # Scrolls at 1 / distance of the camera speed, repeating sideways forever from the copy at origin
+        self.width, self.height = surface.get_size()
+        self.origin = origin
+        self.distance = distance
+        ## Cut into horizontal bands once, fully opaque bands lose their alpha so they blit as plain copies
+        self.bands = []
+        self.opaque_top = self.height
+        for top in range(0, self.height, band_height):
+            band = surface.subsurface((0, top, self.width, min(band_height, self.height - top))).copy()
+            opaque = pygame.surfarray.pixels_alpha(band).min() == 255
+            self.bands.append((top, band.convert() if opaque else band.convert_alpha()))
+            if not opaque:
+                self.opaque_top = top + band.get_height()
+        pass
+
+    def top(self, offset):
+        # Same truncation blitting at the float position gives
+        return int(self.origin[1] - offset.y / self.distance)
+
+    def cover(self, offset):
+        # The screen rows this layer paints over completely, since its opaque bands repeat across the whole width
+        top = self.top(offset)
+        return top + self.opaque_top, top + self.height
+
+    def draw(self, queue, offset, covers = ()):
+        top = self.top(offset)
+        scroll = offset.x / self.distance
+        ## Only the copies that reach the screen, usually one or two
+        copies = []
+        index = floor((scroll - self.origin[0]) / self.width) - 1
+        while True:
+            x = int((self.origin[0] + index * self.width) - scroll)
+            if x >= WINDOW_WIDTH:
+                break
+            if x + self.width > 0:
+                copies.append(x)
+            index += 1
+        for band_top, band in self.bands:
+            y = top + band_top
+            bottom = y + band.get_height()
+            if y >= WINDOW_HEIGHT or bottom <= 0:
+                continue
+            # Bands hidden behind a closer layer's opaque part aren't drawn at all
+            if any(cover_top <= y and bottom <= cover_bottom for cover_top, cover_bottom in covers):
+                continue
+            for x in copies:
+                queue.add(band, (x, y))
+        pass
+    pass
@@ -0,0 +1,169 @@
+import numpy as np
+import pygame
+from code.chunk import DecalLayer
+from code.masks import MASKS
+from code.settings import *
+
+FREE, FLYING = 0, 1
+
+class BloodParticles:
+    def __init__(self, level_group, map_width, map_height, z = LAYERS['main'], capacity = PARTICLE_CAPACITY, seed = None):
+        self.level_group = level_group
+        self.map_width = map_width
+        self.map_height = map_height
+        self.z = z
+        self.rng = np.random.default_rng(seed)
+        ## Particle state, one slot per particle
+        self.state = np.zeros(capacity, np.int8)
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.x_velocity = np.zeros(capacity)
+        self.y_velocity = np.zeros(capacity)
+        self.timer = np.zeros(capacity)
+        self.size = np.zeros(capacity, np.int32)
+        self.color = np.zeros(capacity, np.int32)
+        self.parent = np.full(capacity, -1, np.int32)
+        self.owner = np.full(capacity, -1, np.int32)
+        self.decal = np.zeros(capacity, np.int32)
+        self.spawn_order = np.zeros(capacity, np.int64)
+        self.spawned = 0
+        ## Lookups
+        self.owners = {}
+        self.colors = []
+        self.surfaces = {}
+        ## Landed blood gets baked into these and stops costing anything per frame
+        self.decal_keys = []
+        self.decals = []
+        pass
+
+    def __len__(self):
+        return int(np.count_nonzero(self.state))
+
+    def grow(self, needed):
+        capacity = len(self.state)
+        while capacity < needed:
+            capacity *= 2
+        for name in ['state', 'x', 'y', 'x_velocity', 'y_velocity', 'timer', 'size', 'color', 'parent', 'owner', 'decal', 'spawn_order']:
+            old = getattr(self, name)
+            new = np.full(capacity, -1 if name in ('parent', 'owner') else 0, old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+        pass
+
+    def surface(self, color_index, size):
+        surf = self.surfaces.get((color_index, size))
+        if surf is None:
+            surf = self.surfaces[(color_index, size)] = pygame.Surface((size, size))
+            surf.fill(self.colors[color_index])
+        return surf
+
+    def decal_index(self, key):
+        if key not in self.decal_keys:
+            self.decal_keys.append(key)
+            self.decals.append(DecalLayer(self.z, self.map_width, self.map_height))
+        return self.decal_keys.index(key)
+
+    def emit(self, owner, pos, count, color, max_count, decal_key):
+        if owner not in self.owners:
+            self.owners[owner] = len(self.owners)
+        owner_index = self.owners[owner]
+        if color not in self.colors:
+            self.colors.append(color)
+        decal_index = self.decal_index(decal_key)
+        free = np.flatnonzero(self.state == FREE)
+        if len(free) < count:
+            self.grow(len(self.state) + count)
+            free = np.flatnonzero(self.state == FREE)
+        slots = free[:count]
+        velocity = self.rng.integers(BLOOD_MIN_VELOCITY, BLOOD_MAX_VELOCITY, count) if BLOOD_MIN_VELOCITY != BLOOD_MAX_VELOCITY else np.full(count, BLOOD_MAX_VELOCITY)
+        self.state[slots] = FLYING
+        self.x[slots] = pos[0]
+        self.y[slots] = pos[1]
+        self.x_velocity[slots] = self.rng.uniform(-1, 1, count) * velocity
+        self.y_velocity[slots] = velocity
+        self.timer[slots] = 0
+        if BLOOD_MIN_SCALE != BLOOD_MAX_SCALE:
+            self.size[slots] = (BLOOD_PARTICLE_SIZE * self.rng.uniform(BLOOD_MIN_SCALE, BLOOD_MAX_SCALE, count)).astype(np.int32)
+        else:
+            self.size[slots] = BLOOD_PARTICLE_SIZE
+        self.color[slots] = self.colors.index(color)
+        self.parent[slots] = -1
+        self.owner[slots] = owner_index
+        self.decal[slots] = decal_index
+        self.spawn_order[slots] = np.arange(self.spawned, self.spawned + count)
+        self.spawned += count
+        # Only keep the newest max_count airborne particles of each owner
+        owned = np.flatnonzero((self.owner == owner_index) & (self.state != FREE))
+        if len(owned) > max_count:
+            oldest = owned[np.argsort(self.spawn_order[owned])[:len(owned) - max_count]]
+            self.state[oldest] = FREE
+        pass
+
+    def clear(self, owner, decal_key):
+        if owner in self.owners:
+            self.state[self.owner == self.owners[owner]] = FREE
+        if decal_key in self.decal_keys:
+            self.decals[self.decal_keys.index(decal_key)].clear()
+        for platform in self.level_group.dynamic:
+            platform.clear_decals(decal_key)
+        pass
+
+    def rect_arrays(self, indices):
+        size = self.size[indices]
+        left = np.round(self.x[indices]).astype(np.int64) - size // 2
+        top = np.round(self.y[indices]).astype(np.int64) - size // 2
+        return left, top, size
+
+    def update(self, dt):
+        platforms = self.level_group.dynamic
+        ## Integrate every flying particle in one step
+        flying = np.flatnonzero(self.state == FLYING)
+        if not len(flying):
+            return
+        self.x[flying] += self.x_velocity[flying] * dt
+        self.y_velocity[flying] -= BLOOD_GRAVITY * dt
+        self.y[flying] -= self.y_velocity[flying] * dt
+        self.timer[flying] += dt * 1000
+        settled = self.timer[flying] > BLOOD_LIFETIME
+        ## Level collisions, static geometry first and then the moving platforms
+        left, top, size = self.rect_arrays(flying)
+        hit = self.level_group.hits_solid(left, top, size, size)
+        for index, platform in enumerate(platforms):
+            bounds = MASKS.entry(platform.image)[1].move(platform.rect.topleft)
+            on_platform = ~hit & (left < bounds.right) & (left + size > bounds.left) & (top < bounds.bottom) & (top + size > bounds.top)
+            self.parent[flying[on_platform]] = index
+            hit |= on_platform
+        self.bake(flying[settled | hit])
+        pass
+
+    def bake(self, indices):
+        # Stamp landed particles into the level decals, or into their platform's decal, then free them
+        left, top, size = self.rect_arrays(indices)
+        platforms = self.level_group.dynamic
+        for index, x, y, side, color, decal, parent in zip(indices.tolist(), left.tolist(), top.tolist(), size.tolist(),
+                                                          self.color[indices].tolist(), self.decal[indices].tolist(), self.parent[indices].tolist()):
+            rect = pygame.Rect(x, y, side, side)
+            if parent >= 0:
+                platforms[parent].stamp(self.decal_keys[decal], self.colors[color], rect)
+            else:
+                self.decals[decal].stamp(self.colors[color], rect)
+        self.state[indices] = FREE
+        pass
+
+    def draw(self, queue, offset, alpha = 1):
+        for decal in self.decals:
+            decal.draw(queue, offset)
+        alive = np.flatnonzero(self.state != FREE)
+        if not len(alive):
+            return
+        left, top, size = self.rect_arrays(alive)
+        # Same truncation the sprites get from Rect.center, so particles line up with everything else
+        screen_x = np.trunc(left + size // 2 - offset.x).astype(np.int64) - size // 2
+        screen_y = np.trunc(top + size // 2 - offset.y).astype(np.int64) - size // 2
+        visible = (screen_x < WINDOW_WIDTH) & (screen_x + size > 0) & (screen_y < WINDOW_HEIGHT) & (screen_y + size > 0)
+        colors = self.color[alive][visible].tolist()
+        sizes = size[visible].tolist()
+        queue.extend([(self.surface(color, side), (x, y)) for color, side, x, y in
+                      zip(colors, sizes, screen_x[visible].tolist(), screen_y[visible].tolist())])
+        pass
+    pass
@@ -3,8 +3,10 @@ from os import walk
 from types import NoneType
 import pygame
 from pygame.math import Vector2
+from code.profiler import profiled
+from code.resources import RESOURCES
 from code.settings import *
-from code.sprite import BloodSplat, Bullet, FireAnimation
+from code.sprite import BloodSplat, FireAnimation
 from code.entity import *
 
 # pyright: reportGeneralTypeIssues=false
@@ -40,8 +42,7 @@ class Player(Entity):
         self.jump_released = True
         self.dash_released = True
         ## Collision
-        self.collision_sprites_dict = self.level_group.spritedict
-        self.platform_list = [x for x in self.collision_sprites_dict.keys() if hasattr(x, 'direction')]
+        self.platform_list = self.level_group.dynamic
         self.hitbox: pygame.rect.Rect
         self.hitbox = self.rect.inflate(-self.rect.width * 0.75, 0)
         self.prev_hitbox = self.hitbox.copy()
@@ -54,13 +55,13 @@ class Player(Entity):
         self.bullet_y_duck = 8
         self.bullet_y_jump = -22
         self.bullet_direction_x = 1
-        self.bullet_list = []
         self.bullet_scale = 1
         ## Game Logic
         self.health = PLAYER_MAX_HEALTH
         self.death_y = death_y
         self.blood_gib_count = 100
         self.max_blood = self.blood_gib_count * 4
+        self.blood_decal_key = 'player'
         self.knockback_invulnerability = False
         self.knockback_invulnerability_timer = 0
         self.knockback_invulnerability_period = PLAYER_INVINCIBILITY_TIME
@@ -68,22 +69,23 @@ class Player(Entity):
         self.knockback_timer = 0
         self.knockback_period = PLAYER_KNOCKBACK_TIME
         ## Sounds
-        self.sounds['jump'] = pygame.mixer.Sound("audio/jump.wav")
-        self.sounds['dash'] = pygame.mixer.Sound("audio/dash.wav")
-        self.sounds['step1'] = pygame.mixer.Sound("audio/step1.wav")
-        self.sounds['step2'] = pygame.mixer.Sound("audio/step2.wav")
-        self.sounds['land'] = pygame.mixer.Sound("audio/land.wav")
-        self.sounds['slide'] = pygame.mixer.Sound("audio/slide_loop.wav")
-        self.sounds['pain'] = pygame.mixer.Sound("audio/pain.wav")
-        self.sounds['fall_scream'] = pygame.mixer.Sound("audio/scream.wav")
-        self.sounds['pitfall_scream'] = pygame.mixer.Sound("audio/long_scream.wav")
-        for sound in self.sounds.values():
-            sound: pygame.mixer.Sound
-            sound.set_volume(SOUND_VOLUME)
+        self.sounds['jump'] = RESOURCES.sound("audio/jump.wav")
+        self.sounds['dash'] = RESOURCES.sound("audio/dash.wav")
+        self.sounds['step1'] = RESOURCES.sound("audio/step1.wav")
+        self.sounds['step2'] = RESOURCES.sound("audio/step2.wav")
+        self.sounds['land'] = RESOURCES.sound("audio/land.wav")
+        self.sounds['slide'] = RESOURCES.sound("audio/slide_loop.wav")
+        self.sounds['pain'] = RESOURCES.sound("audio/pain.wav")
+        self.sounds['fall_scream'] = RESOURCES.sound("audio/scream.wav")
+        self.sounds['pitfall_scream'] = RESOURCES.sound("audio/long_scream.wav")
         pass
     
+    def keys(self):
+        # Swapped out on the instance to drive the player from a script instead of the keyboard
+        return pygame.key.get_pressed()
+
     def input(self):
-        keys = pygame.key.get_pressed()
+        keys = self.keys()
         mouse = pygame.mouse.get_pressed()
         if not self.dead:
             self.strafing = keys[PLAYER_STRAFE_KEY]
@@ -149,23 +151,34 @@ class Player(Entity):
     pass
 
     def respawn_input(self):
-        if pygame.key.get_pressed()[PLAYER_JUMP_KEY]:
+        if self.keys()[PLAYER_JUMP_KEY]:
             self.respawn()
             pass
         pass
 
+    def swept_hitbox(self, direction):
+        # Everything the hitbox passed through along this axis since the last tick, so fast moves can't skip over a tile
+        swept = self.hitbox.copy()
+        if direction == 'horizontal':
+            swept.centerx = self.prev_hitbox.centerx
+        else:
+            swept.centery = self.prev_hitbox.centery
+        return swept.union(self.hitbox)
+
+    @profiled('collision')
     def collision(self, direction):
         self.collision_sprites: pygame.sprite.Group
         collided_direction = False
         collisions = False
         platform_touched = False
         if self.direction.magnitude() > 0:
-            collisions = self.rect.collidedictall(self.collision_sprites_dict)  # type: ignore
+            collisions = self.level_group.collide_solids(self.rect.union(self.swept_hitbox(direction)))
         if collisions:
-            for sprite, rect in collisions: # type: ignore
+            for sprite in collisions:
                 sprite: pygame.sprite.Sprite
                 if sprite.hitbox:
-                    if sprite.hitbox.colliderect(self.hitbox):  # type: ignore
+                    # The sweep shrinks back as each hit is resolved, so only the nearest tile along the way stops the player
+                    if sprite.hitbox.colliderect(self.swept_hitbox(direction)):  # type: ignore
                         if direction == 'horizontal':
                             if self.hitbox.right >= sprite.hitbox.left and self.prev_hitbox.right <= sprite.prev_hitbox.left: # right
                                 self.hitbox.right = sprite.hitbox.left
@@ -434,9 +447,7 @@ class Player(Entity):
         # self.knockback_invulnerability = False
         for enemy in self.enemy_group.sprites():
             enemy.respawn()
-        old_blood_list = self.blood_list.copy()
         self.__init__(self.animations, self.pos, self.level_group, self.death_y, self.groups(), self.enemy_group)
-        self.blood_list = old_blood_list
         self.vertical_speed = -400
         self.direction.y = -1
         pass
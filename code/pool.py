@@ -0,0 +1,29 @@
+from code.resources import RESOURCES
+from code.settings import *
+from code.sprite import FireAnimation
+
+class FlashPool:
+    def __init__(self, groups, flash_count = FIRE_POOL_SIZE):
+        fire_image = RESOURCES.image(f"{PATHS['fire']}/0.png")
+        ## Every flash joins its groups once here and stays there, inactive ones are just skipped
+        self.free_flashes = [FireAnimation(self, fire_image, groups) for _ in range(flash_count)]
+        # Dicts keep insertion order, so the first key is always the oldest live object
+        self.active_flashes = {}
+        pass
+
+    def flash(self, entity, surf_list, direction_x):
+        if self.free_flashes:
+            flash = self.free_flashes.pop()
+        else:
+            flash = next(iter(self.active_flashes))
+            flash.release()
+            self.free_flashes.pop()
+        flash.launch(entity, surf_list, direction_x)
+        self.active_flashes[flash] = None
+        return flash
+
+    def release_flash(self, flash):
+        del self.active_flashes[flash]
+        self.free_flashes.append(flash)
+        pass
+    pass
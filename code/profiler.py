@@ -0,0 +1,97 @@
+from collections import deque
+from time import perf_counter
+import pygame
+from code.settings import *
+
+class Profiler:
+    def __init__(self, history = PROFILER_HISTORY):
+        self.enabled = False
+        ## Ring buffer of recent frames, each one a dict of section name to milliseconds plus the frame total
+        self.frames = deque(maxlen = history)
+        self.current = {}
+        self.frame_start = 0
+        self.timing = False
+        pass
+
+    def reset(self):
+        self.frames.clear()
+        self.current = {}
+        pass
+
+    def start(self):
+        # The clock is only read while profiling, so a timed spot costs a flag check while the profiler is hidden
+        return perf_counter() if self.enabled else 0
+
+    def add(self, section, start):
+        self.current[section] = self.current.get(section, 0) + (perf_counter() - start) * 1000
+        pass
+
+    def begin_frame(self):
+        # Only frames that began with profiling on are kept, the one it gets switched on halfway through has no start
+        self.timing = self.enabled
+        if self.enabled:
+            self.frame_start = perf_counter()
+        pass
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        if not self.timing:
+            self.current = {}
+            return
+        # Waiting on the clock isn't work, so it's left out of the frame time
+        total = (perf_counter() - self.frame_start) * 1000 - self.current.pop('idle', 0)
+        self.current['frame'] = total
+        self.frames.append(self.current)
+        self.current = {}
+        pass
+
+    def averages(self):
+        totals = {}
+        for frame in self.frames:
+            for section, time in frame.items():
+                totals[section] = totals.get(section, 0) + time
+        return {section: time / len(self.frames) for section, time in totals.items()}
+
+    def draw(self, surface, font, counts, topright):
+        budget = 1000 / FRAMERATE
+        width, height = PROFILER_GRAPH_SIZE
+        averages = self.averages()
+        sections = sorted((section for section in averages if section != 'frame'), key = averages.get, reverse = True)
+        lines = [F"Frame {averages.get('frame', 0):.2f} ms / budget {budget:.2f} ms"]
+        lines += [F"{section} {averages[section]:.2f} ms" for section in sections]
+        lines += [F"{name}: {count}" for name, count in counts.items()]
+        line_height = font.get_linesize()
+        panel = pygame.Rect(0, 0, width + 20, height + 20 + line_height * len(lines))
+        panel.topright = topright
+        surface.fill((0, 0, 0), panel)
+        ## Frame time graph, scaled so the budget line sits halfway up
+        graph = pygame.Rect(panel.left + 10, panel.top + 10, width, height)
+        scale = height / (budget * 2)
+        bar_width = width / self.frames.maxlen
+        for index, frame in enumerate(self.frames):
+            bar_height = min(height, round(frame['frame'] * scale))
+            color = (0, 200, 0) if frame['frame'] <= budget else (220, 40, 40)
+            surface.fill(color, (graph.left + round(index * bar_width), graph.bottom - bar_height, max(1, round(bar_width)), bar_height))
+        budget_y = graph.bottom - round(budget * scale)
+        pygame.draw.line(surface, 'yellow', (graph.left, budget_y), (graph.right, budget_y))
+        for index, line in enumerate(lines):
+            text = font.render(line, True, 'white')
+            surface.blit(text, (graph.left, graph.bottom + 10 + index * line_height))
+        pass
+    pass
+
+def profiled(section):
+    # Times a method into the given section, it's a single flag check while the profiler is hidden
+    def decorator(method):
+        def wrapper(*args, **kwargs):
+            if not PROFILER.enabled:
+                return method(*args, **kwargs)
+            start = perf_counter()
+            result = method(*args, **kwargs)
+            PROFILER.add(section, start)
+            return result
+        return wrapper
+    return decorator
+
+PROFILER = Profiler()
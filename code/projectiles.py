@@ -0,0 +1,234 @@
+import numpy as np
+import pygame
+from code.masks import MASKS, overlap_mask
+from code.settings import *
+
+def overlapping_pairs(left, top, width, height, rects):
+    if len(left) * len(rects) <= BULLET_BRUTE_FORCE_PAIRS:
+        # Few enough to test every bullet against every target, which beats building the buckets,
+        # and nonzero hands the pairs back in the same bullet then group order
+        overlap = (left[:, None] < rects[:, 0] + rects[:, 2]) & (left[:, None] + width[:, None] > rects[:, 0]) \
+                & (top[:, None] < rects[:, 1] + rects[:, 3]) & (top[:, None] + height[:, None] > rects[:, 1])
+        return np.nonzero(overlap)
+    # Bucket the targets into every cell they cover, stretched up and left by the biggest bullet,
+    # so each bullet only has to look in the cell its top left corner is in
+    cell = SPATIAL_CELL_SIZE
+    x0 = (rects[:, 0] - int(width.max()) + 1) // cell
+    y0 = (rects[:, 1] - int(height.max()) + 1) // cell
+    span_x = np.maximum((rects[:, 0] + rects[:, 2] - 1) // cell - x0 + 1, 0)
+    span_y = np.maximum((rects[:, 1] + rects[:, 3] - 1) // cell - y0 + 1, 0)
+    counts = span_x * span_y
+    owners = np.repeat(np.arange(len(rects)), counts)
+    within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    keys = (y0[owners] + within // span_x[owners]) * 2 ** 32 + x0[owners] + within % span_x[owners]
+    # Stable, so candidates in the same cell stay in group order
+    order = np.argsort(keys, kind = 'stable')
+    keys, owners = keys[order], owners[order]
+    bullet_keys = (top // cell) * 2 ** 32 + left // cell
+    first = np.searchsorted(keys, bullet_keys, 'left')
+    found = np.searchsorted(keys, bullet_keys, 'right') - first
+    bullets = np.repeat(np.arange(len(left)), found)
+    targets = owners[np.repeat(first, found) + np.arange(found.sum()) - np.repeat(np.cumsum(found) - found, found)]
+    target_rects = rects[targets]
+    overlap = (left[bullets] < target_rects[:, 0] + target_rects[:, 2]) & (left[bullets] + width[bullets] > target_rects[:, 0]) \
+            & (top[bullets] < target_rects[:, 1] + target_rects[:, 3]) & (top[bullets] + height[bullets] > target_rects[:, 1])
+    return bullets[overlap], targets[overlap]
+
+class Projectiles:
+    def __init__(self, level_group, z = LAYERS['bg detail'], capacity = BULLET_CAPACITY):
+        self.level_group = level_group
+        self.z = z
+        ## Bullet state, one slot per bullet
+        self.active = np.zeros(capacity, bool)
+        self.launched = np.zeros(capacity, bool)
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.center_x = np.zeros(capacity, np.int64)
+        self.center_y = np.zeros(capacity, np.int64)
+        self.previous_x = np.zeros(capacity, np.int64)
+        self.previous_y = np.zeros(capacity, np.int64)
+        self.direction_x = np.zeros(capacity)
+        self.direction_y = np.zeros(capacity)
+        self.speed = np.zeros(capacity)
+        self.timer = np.zeros(capacity)
+        self.image = np.zeros(capacity, np.int32)
+        self.owner = np.full(capacity, -1, np.int32)
+        self.target = np.full(capacity, -1, np.int32)
+        # Popped from the end, so the lowest free slot gets used first
+        self.free = list(range(capacity - 1, -1, -1))
+        ## Lookups
+        self.owners = {}
+        self.targets = []
+        self.surfaces = []
+        self.widths = np.zeros(0, np.int64)
+        self.heights = np.zeros(0, np.int64)
+        self.target_rects = {}
+        pass
+
+    def __len__(self):
+        return int(np.count_nonzero(self.active))
+
+    def count(self, owner):
+        if owner not in self.owners:
+            return 0
+        return int(np.count_nonzero(self.active & (self.owner == self.owners[owner])))
+
+    def grow(self, needed):
+        capacity = len(self.active)
+        old_capacity = capacity
+        while capacity < needed:
+            capacity *= 2
+        for name in ['active', 'launched', 'x', 'y', 'center_x', 'center_y', 'previous_x', 'previous_y',
+                     'direction_x', 'direction_y', 'speed', 'timer', 'image', 'owner', 'target']:
+            old = getattr(self, name)
+            new = np.full(capacity, -1 if name in ('owner', 'target') else 0, old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+        self.free = list(range(capacity - 1, old_capacity - 1, -1)) + self.free
+        pass
+
+    def image_index(self, surface):
+        if surface not in self.surfaces:
+            self.surfaces.append(surface)
+            self.widths = np.append(self.widths, surface.get_width())
+            self.heights = np.append(self.heights, surface.get_height())
+        return self.surfaces.index(surface)
+
+    def target_index(self, group):
+        if group is None:
+            return -1
+        if group not in self.targets:
+            self.targets.append(group)
+        return self.targets.index(group)
+
+    def fire(self, owner, surface, pos, direction, speed, targets = None):
+        if not self.free:
+            self.grow(len(self.active) + 1)
+        index = self.free.pop()
+        if owner not in self.owners:
+            self.owners[owner] = len(self.owners)
+        if direction[0] == -1:
+            surface = MASKS.flip(surface, True)
+        self.active[index] = True
+        self.launched[index] = True
+        self.x[index], self.y[index] = pos[0], pos[1]
+        # Same truncation a rect centered on the muzzle gets
+        self.center_x[index] = self.previous_x[index] = int(pos[0])
+        self.center_y[index] = self.previous_y[index] = int(pos[1])
+        self.direction_x[index], self.direction_y[index] = direction[0], direction[1]
+        self.speed[index] = speed
+        self.timer[index] = 0
+        self.image[index] = self.image_index(surface)
+        self.owner[index] = self.owners[owner]
+        self.target[index] = self.target_index(targets)
+        return index
+
+    def release(self, indices):
+        self.active[indices] = False
+        self.free.extend(np.atleast_1d(indices).tolist())
+        pass
+
+    def rect_arrays(self, indices):
+        image = self.image[indices]
+        width, height = self.widths[image], self.heights[image]
+        return self.center_x[indices] - width // 2, self.center_y[indices] - height // 2, width, height
+
+    def target_sprites(self, target):
+        # Targets don't move while bullets update, so their rects are gathered once per update
+        cached = self.target_rects.get(target)
+        if cached is None:
+            sprites = self.targets[target].sprites()
+            rects = np.array([tuple(sprite.rect) for sprite in sprites], np.int64).reshape(-1, 4)
+            cached = self.target_rects[target] = (sprites, rects)
+        return cached
+
+    def hit_targets(self, indices, left, top, width, height, target):
+        sprites, rects = self.target_sprites(target)
+        if not sprites:
+            return
+        bullets, candidates = overlapping_pairs(left, top, width, height, rects)
+        # Candidates come out in group order, so the first one for each bullet is the one spritecollideany would have found
+        bullets, first = np.unique(bullets, return_index = True)
+        hits = []
+        for bullet, candidate in zip(bullets.tolist(), candidates[first].tolist()):
+            sprite = sprites[candidate]
+            rect = pygame.Rect(int(left[bullet]), int(top[bullet]), int(width[bullet]), int(height[bullet]))
+            if overlap_mask(self.surfaces[self.image[indices[bullet]]], rect, sprite.image, sprite.rect):
+                if not sprite.dead and sprite.vulnerable:
+                    sprite.damage()
+                    hits.append(indices[bullet])
+        self.release(np.array(hits, np.int64))
+        pass
+
+    def collide(self, indices):
+        if not len(indices):
+            return
+        left, top, width, height = self.rect_arrays(indices)
+        ## Entities, one batch per group being shot at
+        target = self.target[indices]
+        for group in np.unique(target).tolist():
+            if group >= 0:
+                aimed = target == group
+                self.hit_targets(indices[aimed], left[aimed], top[aimed], width[aimed], height[aimed], group)
+        ## Level, static geometry first and then the moving platforms
+        hit = self.level_group.hits_solid(left, top, width, height)
+        for platform in self.level_group.dynamic:
+            bounds = MASKS.entry(platform.image)[1].move(platform.rect.topleft)
+            hit |= (left < bounds.right) & (left + width > bounds.left) & (top < bounds.bottom) & (top + height > bounds.top)
+        self.release(indices[hit & self.active[indices]])
+        pass
+
+    def update(self, dt):
+        live = np.flatnonzero(self.active)
+        self.previous_x[live] = self.center_x[live]
+        self.previous_y[live] = self.center_y[live]
+        if not len(live):
+            return
+        self.target_rects = {}
+        # Bullets fired this tick wait for the next one, like fresh sprites joining a group mid-update did
+        moving = live[~self.launched[live]]
+        self.launched[live] = False
+        # The muzzle is the only spot the sweep below hasn't already checked
+        self.collide(moving[self.timer[moving] == 0])
+        moving = moving[self.active[moving]]
+        ## Sweep every bullet in steps no longer than BULLET_SWEEP_STEP, all of them taking each step together
+        start_x, start_y = self.x[moving], self.y[moving]
+        travel_x = self.direction_x[moving] * self.speed[moving] * dt
+        travel_y = self.direction_y[moving] * self.speed[moving] * dt
+        steps = np.maximum(1, np.ceil(np.hypot(travel_x, travel_y) / BULLET_SWEEP_STEP)).astype(np.int64)
+        for step in range(1, int(steps.max(initial = 0)) + 1):
+            current = (steps >= step) & self.active[moving]
+            indices = moving[current]
+            fraction = step / steps[current]
+            self.x[indices] = start_x[current] + travel_x[current] * fraction
+            self.y[indices] = start_y[current] + travel_y[current] * fraction
+            self.center_x[indices] = np.round(self.x[indices])
+            self.center_y[indices] = np.round(self.y[indices])
+            self.collide(indices)
+        moving = moving[self.active[moving]]
+        self.timer[moving] += dt * 1000
+        self.release(moving[self.timer[moving] > BULLET_FADE_TIME])
+        pass
+
+    def draw(self, queue, offset, alpha = 1):
+        live = np.flatnonzero(self.active)
+        if not len(live):
+            return
+        x, y = self.center_x[live], self.center_y[live]
+        if alpha < 1:
+            previous_x, previous_y = self.previous_x[live], self.previous_y[live]
+            # Snap instead of sliding, same as the sprites
+            steady = (np.abs(x - previous_x) <= INTERPOLATION_SNAP) & (np.abs(y - previous_y) <= INTERPOLATION_SNAP)
+            x = np.where(steady, previous_x + (x - previous_x) * alpha, x)
+            y = np.where(steady, previous_y + (y - previous_y) * alpha, y)
+        image = self.image[live]
+        width, height = self.widths[image], self.heights[image]
+        # Same truncation the sprites get from Rect.center, so bullets line up with everything else
+        screen_x = np.trunc(np.trunc(x) - offset.x).astype(np.int64) - width // 2
+        screen_y = np.trunc(np.trunc(y) - offset.y).astype(np.int64) - height // 2
+        visible = (screen_x < WINDOW_WIDTH) & (screen_x + width > 0) & (screen_y < WINDOW_HEIGHT) & (screen_y + height > 0)
+        surfaces = self.surfaces
+        queue.extend([(surfaces[index], (left, top)) for index, left, top in
+                      zip(image[visible].tolist(), screen_x[visible].tolist(), screen_y[visible].tolist())])
+        pass
+    pass
@@ -0,0 +1,52 @@
+from code.settings import *
+
+class RenderQueue:
+    def __init__(self):
+        ## Screen space (surface, position) pairs waiting for the next submit
+        self.items = []
+        self.offset_x = 0
+        self.offset_y = 0
+        ## Per frame counters, the pixel fill is only worked out while someone is looking at it
+        self.measure = False
+        self.stats = {'draw calls': 0, 'blits': 0, 'pixels': 0}
+        pass
+
+    def begin(self, offset):
+        self.items = []
+        self.offset_x, self.offset_y = offset.x, offset.y
+        self.stats = {'draw calls': 0, 'blits': 0, 'pixels': 0}
+        pass
+
+    def add(self, surface, pos):
+        self.items.append((surface, pos))
+        pass
+
+    def add_centered(self, surface, center):
+        # Same truncation a Rect centered on the sprite and moved by the camera gets, without building the Rect
+        self.items.append((surface, (int(int(center[0]) - self.offset_x) - surface.get_width() // 2,
+                                     int(int(center[1]) - self.offset_y) - surface.get_height() // 2)))
+        pass
+
+    def extend(self, items):
+        self.items.extend(items)
+        pass
+
+    def fill(self, target):
+        width, height = target.get_size()
+        pixels = 0
+        for surface, (x, y) in self.items:
+            x, y = int(x), int(y)
+            pixels += max(0, min(x + surface.get_width(), width) - max(x, 0)) * max(0, min(y + surface.get_height(), height) - max(y, 0))
+        return pixels
+
+    def submit(self, target):
+        if not self.items:
+            return
+        if self.measure:
+            self.stats['pixels'] += self.fill(target)
+        self.stats['draw calls'] += 1
+        self.stats['blits'] += len(self.items)
+        target.fblits(self.items)
+        self.items = []
+        pass
+    pass
@@ -0,0 +1,154 @@
+import json, struct, zlib
+import numpy as np
+import pygame
+from code import settings
+from code.settings import *
+
+## Every key the player reads, one bit each in the order below
+INPUT_KEYS = [PLAYER_LEFT_KEY, PLAYER_RIGHT_KEY, PLAYER_DUCK_KEY, PLAYER_JUMP_KEY, PLAYER_SHOOT_KEY, PLAYER_DASH_KEY, PLAYER_STRAFE_KEY, PLAYER_RESTART_KEY]
+INPUT_BITS = {key: bit for bit, key in enumerate(INPUT_KEYS)}
+MAGIC = b'CREC'
+VERSION = 1
+
+class InputMask:
+    # Stands in for pygame.key.get_pressed(), answering from one tick's bitmask
+    def __init__(self, mask = 0):
+        self.mask = mask
+
+    def __getitem__(self, key):
+        bit = INPUT_BITS.get(key)
+        return bit is not None and bool(self.mask >> bit & 1)
+    pass
+
+def encode_keys(keys):
+    mask = 0
+    for bit, key in enumerate(INPUT_KEYS):
+        if keys[key]:
+            mask |= 1 << bit
+    return mask
+
+def settings_snapshot():
+    snapshot = {}
+    for name in dir(settings):
+        if name.isupper():
+            try:
+                snapshot[name] = json.loads(json.dumps(getattr(settings, name)))
+            except TypeError:
+                pass
+    return snapshot
+
+def checksum(game):
+    # Everything the simulation decides on, so two runs only match if they played out the same
+    crc = zlib.crc32(struct.pack('<Iddi?', game.ticks, game.player.pos.x, game.player.pos.y, game.player.health, game.player.dead))
+    enemies = game.enemies
+    count = len(enemies)
+    for array in [enemies.x, enemies.y, enemies.health, enemies.dead, enemies.facing]:
+        crc = zlib.crc32(array[:count].tobytes(), crc)
+    projectiles = game.all_sprites.projectiles
+    live = np.flatnonzero(projectiles.active)
+    for array in [live, projectiles.center_x[live], projectiles.center_y[live]]:
+        crc = zlib.crc32(array.tobytes(), crc)
+    return crc
+
+class Recording:
+    def __init__(self, seed, map_path, settings = None, interval = REPLAY_CHECKSUM_INTERVAL):
+        self.seed = seed
+        self.map_path = map_path
+        self.settings = settings if settings is not None else settings_snapshot()
+        self.interval = interval
+        ## One byte of input per tick, and a checksum of the game state every interval ticks
+        self.inputs = bytearray()
+        self.checksums = []
+        pass
+
+    def __len__(self):
+        return len(self.inputs)
+
+    def save(self, path):
+        header = json.dumps({'map': self.map_path, 'settings': self.settings, 'interval': self.interval}).encode()
+        inputs = zlib.compress(bytes(self.inputs), 9)
+        with open(path, 'wb') as file:
+            file.write(struct.pack('<4sHQI', MAGIC, VERSION, self.seed, len(header)))
+            file.write(header)
+            file.write(struct.pack('<II', len(self.inputs), len(inputs)))
+            file.write(inputs)
+            file.write(struct.pack('<I', len(self.checksums)))
+            file.write(np.array(self.checksums, '<u4').tobytes())
+        pass
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as file:
+            magic, version, seed, header_size = struct.unpack('<4sHQI', file.read(18))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a version {VERSION} recording")
+            header = json.loads(file.read(header_size))
+            ticks, size = struct.unpack('<II', file.read(8))
+            inputs = zlib.decompress(file.read(size))
+            count, = struct.unpack('<I', file.read(4))
+            checksums = np.frombuffer(file.read(count * 4), '<u4').tolist()
+        recording = cls(seed, header['map'], header['settings'], header['interval'])
+        recording.inputs = bytearray(inputs[:ticks])
+        recording.checksums = checksums
+        return recording
+
+    def changed_settings(self):
+        current = settings_snapshot()
+        return sorted(name for name in set(current) | set(self.settings) if current.get(name) != self.settings.get(name))
+    pass
+
+class Recorder:
+    # Samples the keyboard once per tick, feeds that to the player and keeps it, saving everything on close
+    def __init__(self, game, path, recording):
+        self.game = game
+        self.path = path
+        self.recording = recording
+        self.keys = InputMask()
+        game.player.keys = lambda: self.keys
+        pass
+
+    def sample(self):
+        self.keys.mask = encode_keys(pygame.key.get_pressed())
+        self.recording.inputs.append(self.keys.mask)
+        pass
+
+    def check(self):
+        if self.game.ticks % self.recording.interval == 0:
+            self.recording.checksums.append(checksum(self.game))
+        pass
+
+    def close(self):
+        self.recording.save(self.path)
+        pass
+    pass
+
+class Replayer:
+    # Feeds a recording back in tick by tick, and remembers the first tick the game state stopped matching it
+    def __init__(self, game, recording):
+        self.game = game
+        self.recording = recording
+        self.keys = InputMask()
+        self.diverged = None
+        game.player.keys = lambda: self.keys
+        pass
+
+    def finished(self):
+        return self.game.ticks >= len(self.recording)
+
+    def sample(self):
+        # Past the end of the recording nothing is held down
+        self.keys.mask = self.recording.inputs[self.game.ticks] if not self.finished() else 0
+        pass
+
+    def check(self):
+        ticks = self.game.ticks
+        if ticks % self.recording.interval == 0 and self.diverged is None:
+            index = ticks // self.recording.interval - 1
+            if index < len(self.recording.checksums) and checksum(self.game) != self.recording.checksums[index]:
+                self.diverged = ticks
+                print(F"Replay diverged from the recording by tick {ticks}")
+        pass
+
+    def close(self):
+        pass
+    pass
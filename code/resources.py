@@ -0,0 +1,99 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from time import perf_counter
+import pygame
+from code.settings import *
+
+class Resources:
+    def __init__(self):
+        self.images = {}
+        self.sounds = {}
+        # Frames cut out of each atlas, shared by every game in the process
+        self.animation_sets = {}
+        # Layers baked out of the map and the sky, nothing draws into them afterwards so every game can share them
+        self.layers = {}
+        self.loads = {'image': 0, 'sound': 0}
+        self.requests = {'image': 0, 'sound': 0}
+        self.bytes = {'image': 0, 'sound': 0}
+        ## What the last preload loaded of each kind, total is the time until its last file was stored and decoding is summed over every worker thread
+        self.timings = {kind: {'count': 0, 'decode': 0, 'convert': 0, 'total': 0} for kind in self.loads}
+        pass
+
+    def store_image(self, key, surf):
+        surf = surf.convert_alpha() if key[1] else surf.convert()
+        self.images[key] = surf
+        self.loads['image'] += 1
+        self.bytes['image'] += surf.get_pitch() * surf.get_height()
+        return surf
+
+    def store_sound(self, key, sound, volume = SOUND_VOLUME):
+        sound.set_volume(volume)
+        self.sounds[key] = sound
+        self.loads['sound'] += 1
+        frequency, size, channels = pygame.mixer.get_init()
+        self.bytes['sound'] += round(sound.get_length() * frequency) * channels * abs(size) // 8
+        return sound
+
+    def image(self, path, alpha = True):
+        self.requests['image'] += 1
+        surf = self.images.get((path, alpha))
+        if surf is None:
+            surf = self.store_image((path, alpha), pygame.image.load(path))
+        return surf
+
+    def sound(self, path, volume = SOUND_VOLUME):
+        self.requests['sound'] += 1
+        sound = self.sounds.get(path)
+        if sound is None:
+            sound = self.store_sound(path, pygame.mixer.Sound(path), volume)
+        return sound
+
+    def animations(self, image_path, rects):
+        # One set per atlas, so caches keyed on the set, like the blink frames, don't gain an entry for every new game
+        frames = self.animation_sets.get(image_path)
+        if frames is None:
+            atlas = self.image(image_path)
+            frames = self.animation_sets[image_path] = {name: [atlas.subsurface(rect) for rect in frame_rects] for name, frame_rects in rects.items()}
+        return frames
+
+    def layer(self, key, build):
+        layer = self.layers.get(key)
+        if layer is None:
+            layer = self.layers[key] = build()
+        return layer
+
+    def decode(self, kind, path):
+        start = perf_counter()
+        loaded = pygame.image.load(path) if kind == 'image' else pygame.mixer.Sound(path)
+        return loaded, perf_counter() - start
+
+    def preload(self, images = (), sounds = (), progress = None, threads = LOADING_THREADS):
+        # pygame lets go of the GIL while it decodes, so files are decoded on a pool while surfaces get converted here
+        start = perf_counter()
+        self.timings = {kind: {'count': 0, 'decode': 0, 'convert': 0, 'total': 0} for kind in self.loads}
+        jobs = {}
+        with ThreadPoolExecutor(threads) as executor:
+            for path, alpha in images:
+                if (path, alpha) not in self.images:
+                    jobs[executor.submit(self.decode, 'image', path)] = ('image', (path, alpha))
+            for path in sounds:
+                if path not in self.sounds:
+                    jobs[executor.submit(self.decode, 'sound', path)] = ('sound', path)
+            for done, future in enumerate(as_completed(jobs), 1):
+                kind, key = jobs[future]
+                loaded, decode_time = future.result()
+                convert_start = perf_counter()
+                self.store_image(key, loaded) if kind == 'image' else self.store_sound(key, loaded)
+                timing = self.timings[kind]
+                timing['count'] += 1
+                timing['decode'] += decode_time
+                timing['convert'] += perf_counter() - convert_start
+                timing['total'] = perf_counter() - start
+                if progress:
+                    progress(done, len(jobs))
+        return self.timings
+
+    def stats(self):
+        return {kind: {'loads': self.loads[kind], 'requests': self.requests[kind], 'bytes': self.bytes[kind]} for kind in self.loads}
+    pass
+
+RESOURCES = Resources()
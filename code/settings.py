@@ -2,6 +2,28 @@ import pygame
 
 WINDOW_WIDTH, WINDOW_HEIGHT = 1600, 900
 FRAMERATE = 72
+## Simulation
+TICK_RATE = 72
+TICK_TIME = 1 / TICK_RATE
+MAX_FRAME_TIME = 0.25
+INTERPOLATION_SNAP = 128
+## Benchmark
+BENCHMARK_PHASE_TICKS = 90
+BENCHMARK_NOISE_FLOOR = 0.05
+## Replay
+REPLAY_CHECKSUM_INTERVAL = 72
+## Batch
+BATCH_POLICY_HOLD_TICKS = 18
+## Environment
+ENV_FRAME_SKIP = 1
+ENV_MAX_TICKS = TICK_RATE * 120
+ENV_FRAME_SIZE = (160, 90)
+ENV_OBSERVED_ENEMIES = 4
+ENV_OBSERVED_BULLETS = 4
+ENV_REWARD_KILL, ENV_REWARD_HIT, ENV_REWARD_DEATH, ENV_REWARD_WIN = 1, -0.25, -1, 5
+## Profiler
+PROFILER_HISTORY = 180
+PROFILER_GRAPH_SIZE = (360, 80)
 ## Player
 PLAYER_SPEED = 400
 PLAYER_ANIMATION_SPEED = 10
@@ -29,6 +51,7 @@ PLAYER_STRAFE_KEY = pygame.K_LSHIFT
 PLAYER_RESTART_KEY = pygame.K_k
 PLAYER_FRAMERATE_KEY = pygame.K_p
 PLAYER_FULLSCREEN_KEY = pygame.K_f
+PLAYER_COLLISION_DEBUG_KEY = pygame.K_h
 ## Enemy
 ENEMY_ANIMATION_SPEED = 5
 ENEMY_BULLET_SPEED = 400
@@ -38,11 +61,32 @@ ENEMY_TURN_DELAY_MAX = 2000
 ENEMY_AGGRO_DISTANCE = 750
 ENEMY_MAX_HEALTH = 2
 ENEMY_BLINK_TIME = 100
+ENEMY_CAPACITY = 64
+ENEMY_ACTIVATION_MARGIN = 512
 ## Game Logic
 BULLET_FADE_TIME = 5000
 FIRE_ANIMATION_SPEED = 24
+BULLET_CAPACITY = 256
+BULLET_SWEEP_STEP = 16
+BULLET_BRUTE_FORCE_PAIRS = 4096
+FIRE_POOL_SIZE = 32
+## Blood
+BLOOD_PARTICLE_SIZE = 12
+BLOOD_MIN_VELOCITY = 100
+BLOOD_MAX_VELOCITY = 1000
+BLOOD_GRAVITY = 2400
+BLOOD_LIFETIME = 3000
+BLOOD_MIN_SCALE, BLOOD_MAX_SCALE = 0.25, 1.25
+PARTICLE_CAPACITY = 4096
+PARTICLE_COLLISION_RESOLUTION = 4
+DECAL_PADDING = 16
 ## Platforms
 PLATFORM_SPEED = 200
+## Rendering
+CHUNK_SIZE = 512
+SPATIAL_CELL_SIZE = 256
+SPATIAL_VIEW_MARGIN = 128
+PARALLAX_BAND_HEIGHT = 64
 ## Sound
 MUSIC_VOLUME, SOUND_VOLUME = 0.5, 0.25
 
@@ -53,6 +97,11 @@ LAYERS = {
 	'fg detail bottom': 3,
 	'fg detail top': 4,
 }
+LAYER_NAMES = {z: name for name, z in LAYERS.items()}
+
+ATLAS_MAX_WIDTH = 2048
+LOADING_THREADS = 4
+LOADING_BAR_SIZE = (400, 16)
 
 PATHS = {
 	'map': "data/map.tmx",
@@ -61,5 +110,6 @@ PATHS = {
 	'player': "graphics/player",
 	'enemy': "graphics/enemies/standard",
 	'bullet': "graphics/bullet.png",
-	'fire': "graphics/fire"
+	'fire': "graphics/fire",
+	'cache': "cache"
 }
\ No newline at end of file
@@ -0,0 +1,83 @@
+from code.settings import *
+
+class SpatialGrid:
+    def __init__(self, cell_size = SPATIAL_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.bounds = {}
+        self.order = {}
+        self.pending = set()
+        self.counter = 0
+        pass
+
+    def cell_range(self, rect):
+        return (rect.left // self.cell_size, rect.top // self.cell_size,
+                (rect.right - 1) // self.cell_size, (rect.bottom - 1) // self.cell_size)
+
+    def insert(self, sprite):
+        # Keep insertion order for drawing, and wait for the next move or query to bucket the sprite,
+        # since sprites join their groups before they have a rect
+        self.order[sprite] = self.counter
+        self.counter += 1
+        self.pending.add(sprite)
+        pass
+
+    def place(self, sprite, bounds):
+        self.bounds[sprite] = bounds
+        left, top, right, bottom = bounds
+        for cy in range(top, bottom + 1):
+            for cx in range(left, right + 1):
+                cell = self.cells.get((cx, cy))
+                if cell is None:
+                    cell = self.cells[(cx, cy)] = set()
+                cell.add(sprite)
+        pass
+
+    def unplace(self, sprite):
+        left, top, right, bottom = self.bounds.pop(sprite)
+        for cy in range(top, bottom + 1):
+            for cx in range(left, right + 1):
+                cell = self.cells[(cx, cy)]
+                cell.discard(sprite)
+                if not cell:
+                    del self.cells[(cx, cy)]
+        pass
+
+    def remove(self, sprite):
+        if sprite in self.bounds:
+            self.unplace(sprite)
+        self.order.pop(sprite, None)
+        self.pending.discard(sprite)
+        pass
+
+    def move(self, sprite):
+        # Pooled sprites that are parked stay out of the cells until they're used again
+        if not getattr(sprite, 'active', True):
+            if sprite in self.bounds:
+                self.unplace(sprite)
+            self.pending.discard(sprite)
+            return
+        # Only touch the cells when the sprite actually crossed into a different set of them
+        bounds = self.cell_range(sprite.rect)
+        if bounds != self.bounds.get(sprite):
+            if sprite in self.bounds:
+                self.unplace(sprite)
+            self.place(sprite, bounds)
+        self.pending.discard(sprite)
+        pass
+
+    def query(self, rect, layers):
+        for sprite in list(self.pending):
+            self.move(sprite)
+        found = set()
+        left, top, right, bottom = self.cell_range(rect)
+        for cy in range(top, bottom + 1):
+            for cx in range(left, right + 1):
+                cell = self.cells.get((cx, cy))
+                if cell:
+                    found.update(cell)
+        grouped = [[] for _ in range(layers)]
+        for sprite in sorted(found, key = self.order.__getitem__):
+            grouped[sprite.z].append(sprite)
+        return grouped
+    pass
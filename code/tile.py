@@ -29,8 +29,20 @@ class MovingPlatform(Tile):
         self.border_list = border_list
         self.player_group: pygame.sprite.Group
         self.player_group = player_group
+        self.decals = {}
         # print("I live!")
         pass
+
+    def stamp(self, key, color, rect):
+        if key not in self.decals:
+            self.decals[key] = PlatformDecal(self, self.groups()[0])
+        self.decals[key].stamp(color, rect)
+        pass
+
+    def clear_decals(self, key):
+        if key in self.decals:
+            self.decals.pop(key).kill()
+        pass
     
     def update(self, dt):
         self.pos.y += self.speed * self.direction.y * dt
@@ -51,4 +63,23 @@ class MovingPlatform(Tile):
             self.pos = Vector2(self.rect.topleft)
             self.direction.y *= -1
         self.hitbox.topleft = self.rect.topleft
-        pass
\ No newline at end of file
+        pass
+
+class PlatformDecal(pygame.sprite.Sprite):
+    def __init__(self, platform, groups, padding = DECAL_PADDING):
+        super().__init__(groups)
+        self.platform = platform
+        self.padding = padding
+        # Padded on every side so it stays centered on the platform when drawn
+        self.image = pygame.Surface((platform.rect.width + padding * 2, platform.rect.height + padding * 2), pygame.SRCALPHA).convert_alpha()
+        self.rect = platform.rect.copy()
+        self.z = platform.z
+        pass
+
+    def stamp(self, color, rect):
+        self.image.fill(color, rect.move(self.padding - self.platform.rect.x, self.padding - self.platform.rect.y))
+        pass
+
+    def update(self, dt):
+        self.rect.topleft = self.platform.rect.topleft
+        pass
@@ -0,0 +1,208 @@
+import argparse, itertools, random, struct, sys, time, zlib
+import numpy as np
+import pygame
+import main
+from code.replay import INPUT_BITS, InputMask, checksum
+from code.settings import *
+
+## Every action is one choice from each group, so there's an action for every way the controls can be held together
+ACTION_KEYS = [[None, PLAYER_LEFT_KEY, PLAYER_RIGHT_KEY], [None, PLAYER_JUMP_KEY, PLAYER_DUCK_KEY], [None, PLAYER_SHOOT_KEY],
+               [None, PLAYER_DASH_KEY], [None, PLAYER_STRAFE_KEY]]
+ACTIONS = [tuple(key for key in keys if key is not None) for keys in itertools.product(*ACTION_KEYS)]
+ACTION_MASKS = [sum(1 << INPUT_BITS[key] for key in keys) for keys in ACTIONS]
+## Feature vector layout, the player first and then the nearest enemies and the nearest bullets aimed at the player
+PLAYER_FEATURES = 13
+ENEMY_FEATURES = 5
+BULLET_FEATURES = 4
+OBSERVATIONS = ['features', 'frames']
+
+def nearest(dx, dy, count):
+	return np.argsort(dx * dx + dy * dy, kind = 'stable')[:count]
+
+class ContraEnv:
+	# One headless game behind reset() and step(), every reset builds the game again so episodes always start from the same state
+	def __init__(self, seed = None, observation = 'features', frame_skip = ENV_FRAME_SKIP, max_ticks = ENV_MAX_TICKS, map_path = PATHS['map']):
+		if observation not in OBSERVATIONS:
+			raise ValueError(f"observation must be one of {', '.join(OBSERVATIONS)}, not {observation}")
+		self.observation = observation
+		self.frame_skip = frame_skip
+		self.max_ticks = max_ticks
+		self.map_path = map_path
+		self.keys = InputMask()
+		self.seeds = random.Random(seed)
+		## Spaces
+		self.action_count = len(ACTIONS)
+		if observation == 'frames':
+			self.frame = pygame.Surface(ENV_FRAME_SIZE)
+			self.observation_shape = (ENV_FRAME_SIZE[1], ENV_FRAME_SIZE[0], 3)
+			self.observation_dtype = np.uint8
+		else:
+			self.observation_shape = (PLAYER_FEATURES + ENV_OBSERVED_ENEMIES * ENEMY_FEATURES + ENV_OBSERVED_BULLETS * BULLET_FEATURES,)
+			self.observation_dtype = np.float32
+		self.reset(seed)
+		pass
+
+	def reset(self, seed = None):
+		# Games share their baked layers and animations, so a new one only takes a few milliseconds.
+		# Without a seed the episode gets the next one from the last seeded reset, so a seeded environment repeats all of its episodes
+		if seed is not None:
+			self.seeds = random.Random(seed)
+		self.seed = seed if seed is not None else self.seeds.randrange(2 ** 32)
+		self.game = main.Main(headless = True, map_path = self.map_path, seed = self.seed)
+		game = self.game
+		game.player.keys = lambda: self.keys
+		# Enemies roll their turns on the global random, so every environment keeps its own stream and swaps it in to step
+		self.random_state = random.getstate()
+		self.player_target = game.all_sprites.projectiles.target_index(game.player_group)
+		## Episode
+		self.keys.mask = 0
+		self.ticks = 0
+		self.kills = 0
+		self.alive = game.enemies.alive
+		self.health = game.player.health
+		return self.observe(), self.info()
+
+	def step(self, action):
+		game = self.game
+		player, enemies = game.player, game.enemies
+		self.keys.mask = ACTION_MASKS[action]
+		random.setstate(self.random_state)
+		for _ in range(self.frame_skip):
+			game.step()
+			self.ticks += 1
+			if player.dead or not enemies.alive:
+				break
+		self.random_state = random.getstate()
+		## Rewards, health lost to a death is covered by the death itself
+		kills = max(0, self.alive - enemies.alive)
+		hits = max(0, self.health - player.health) if not player.dead else 0
+		won = not enemies.alive
+		reward = kills * ENV_REWARD_KILL + hits * ENV_REWARD_HIT + player.dead * ENV_REWARD_DEATH + won * ENV_REWARD_WIN
+		self.kills += kills
+		self.alive = enemies.alive
+		self.health = player.health
+		terminated = player.dead or won
+		truncated = not terminated and self.ticks >= self.max_ticks
+		return self.observe(), float(reward), terminated, truncated, self.info()
+
+	def info(self):
+		return {'ticks': self.ticks, 'kills': self.kills, 'health': self.health, 'won': not self.alive}
+
+	def observe(self):
+		if self.observation == 'frames':
+			return self.frame_array()
+		return self.features()
+
+	def features(self):
+		game = self.game
+		player, enemies, projectiles = game.player, game.enemies, game.all_sprites.projectiles
+		x, y = player.pos
+		features = np.zeros(self.observation_shape, np.float32)
+		features[:PLAYER_FEATURES] = (x / game.all_sprites.map_width, y / game.all_sprites.map_height, player.direction.x,
+		                              player.vertical_speed / PLAYER_JUMP_SPEED, player.health / PLAYER_MAX_HEALTH, player.dead, player.can_jump,
+		                              player.can_wall_jump, player.dashing, player.ducking, player.strafing, player.bullet_direction_x, player.bullet_ready)
+		## Nearest living enemies, relative to the player and in screens
+		living = np.flatnonzero(~enemies.dead[:len(enemies)])
+		dx, dy = (enemies.x[living] - x) / WINDOW_WIDTH, (enemies.y[living] - y) / WINDOW_HEIGHT
+		chosen = nearest(dx, dy, ENV_OBSERVED_ENEMIES)
+		start = PLAYER_FEATURES
+		block = features[start:start + ENV_OBSERVED_ENEMIES * ENEMY_FEATURES].reshape(ENV_OBSERVED_ENEMIES, ENEMY_FEATURES)
+		block[:len(chosen)] = np.column_stack([dx[chosen], dy[chosen], enemies.facing[living[chosen]], enemies.health[living[chosen]] / ENEMY_MAX_HEALTH,
+		                                       np.ones(len(chosen))])
+		## Nearest bullets flying at the player
+		flying = np.flatnonzero(projectiles.active & (projectiles.target == self.player_target))
+		dx, dy = (projectiles.center_x[flying] - x) / WINDOW_WIDTH, (projectiles.center_y[flying] - y) / WINDOW_HEIGHT
+		chosen = nearest(dx, dy, ENV_OBSERVED_BULLETS)
+		start += ENV_OBSERVED_ENEMIES * ENEMY_FEATURES
+		block = features[start:].reshape(ENV_OBSERVED_BULLETS, BULLET_FEATURES)
+		block[:len(chosen)] = np.column_stack([dx[chosen], dy[chosen], projectiles.direction_x[flying[chosen]], np.ones(len(chosen))])
+		return features
+
+	def frame_array(self):
+		# Drawn at full size into the shared window surface and shrunk straight away, so environments can take turns with it
+		self.game.draw()
+		pygame.transform.scale(self.game.display_surface, ENV_FRAME_SIZE, self.frame)
+		return pygame.surfarray.array3d(self.frame).swapaxes(0, 1)
+	pass
+
+class VectorEnv:
+	# Steps many environments in one call and resets each one as soon as its episode ends, returning everything stacked
+	def __init__(self, count, seed = 0, **kwargs):
+		self.envs = [ContraEnv(seed + index, **kwargs) for index in range(count)]
+		self.action_count = self.envs[0].action_count
+		self.observation_shape = (count,) + self.envs[0].observation_shape
+		self.observations = np.zeros(self.observation_shape, self.envs[0].observation_dtype)
+		pass
+
+	def __len__(self):
+		return len(self.envs)
+
+	def reset(self, seed = None):
+		infos = []
+		for index, env in enumerate(self.envs):
+			self.observations[index], info = env.reset(None if seed is None else seed + index)
+			infos.append(info)
+		return self.observations.copy(), infos
+
+	def step(self, actions):
+		count = len(self.envs)
+		rewards = np.zeros(count, np.float32)
+		terminated = np.zeros(count, bool)
+		truncated = np.zeros(count, bool)
+		infos = []
+		for index, (env, action) in enumerate(zip(self.envs, np.asarray(actions).tolist())):
+			observation, rewards[index], terminated[index], truncated[index], info = env.step(action)
+			# The finished episode's last observation goes in the info, the returned one already starts the next
+			if terminated[index] or truncated[index]:
+				info['final_observation'] = observation
+				observation, _ = env.reset()
+			self.observations[index] = observation
+			infos.append(info)
+		return self.observations.copy(), rewards, terminated, truncated, infos
+	pass
+
+def trajectory_hash(env, seed, actions):
+	# Everything the agent saw and got, plus the game state, over the given actions from a seeded reset, episodes after it included
+	observation, info = env.reset(seed)
+	crc = zlib.crc32(observation.tobytes())
+	for action in actions:
+		observation, reward, terminated, truncated, info = env.step(action)
+		crc = zlib.crc32(observation.tobytes(), crc)
+		crc = zlib.crc32(struct.pack('<d??I', reward, terminated, truncated, checksum(env.game)), crc)
+		if terminated or truncated:
+			observation, info = env.reset()
+	return crc
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description = "step environments with random actions and report the throughput")
+	parser.add_argument('--envs', type = int, default = 8, help = "environments stepped together")
+	parser.add_argument('--steps', type = int, default = 2000, help = "vector steps to take")
+	parser.add_argument('--observation', choices = OBSERVATIONS, default = 'features')
+	parser.add_argument('--frame-skip', type = int, default = ENV_FRAME_SKIP, help = "ticks each action is held for")
+	parser.add_argument('--seed', type = int, default = 0)
+	parser.add_argument('--check', action = 'store_true', help = "check that a seeded reset replays the same steps the same way, exiting with an error if not")
+	args = parser.parse_args()
+	if args.check:
+		actions = np.random.default_rng(args.seed % 2 ** 32).integers(len(ACTIONS), size = args.steps).tolist()
+		env = ContraEnv(args.seed, observation = args.observation, frame_skip = args.frame_skip)
+		runs = {'first reset': trajectory_hash(env, args.seed, actions), 'second reset': trajectory_hash(env, args.seed, actions),
+		        'new environment': trajectory_hash(ContraEnv(args.seed, observation = args.observation, frame_skip = args.frame_skip), args.seed, actions)}
+		for name, crc in runs.items():
+			print(F"{name:<16}{crc:08x}")
+		matched = len(set(runs.values())) == 1
+		print(F"{args.steps} steps from reset(seed = {args.seed}) {'matched' if matched else 'did not match'}")
+		sys.exit(0 if matched else 1)
+	envs = VectorEnv(args.envs, args.seed, observation = args.observation, frame_skip = args.frame_skip)
+	envs.reset(args.seed)
+	rng = np.random.default_rng(args.seed % 2 ** 32)
+	episodes = 0
+	total_reward = 0
+	start = time.perf_counter()
+	for _ in range(args.steps):
+		observations, rewards, terminated, truncated, infos = envs.step(rng.integers(envs.action_count, size = len(envs)))
+		episodes += int(np.count_nonzero(terminated | truncated))
+		total_reward += float(rewards.sum())
+	elapsed = time.perf_counter() - start
+	steps = args.steps * len(envs)
+	print(F"{steps} steps in {elapsed:.2f}s ({steps / elapsed:.0f} steps/s, {steps * args.frame_skip / elapsed / TICK_RATE:.1f}x real time)")
+	print(F"{episodes} episodes finished, {total_reward:.2f} total reward")
@@ -1,6 +1,7 @@
 @echo off
 python3 -m pip install pytmx
 python3 -m pip install pygame-ce
+python3 -m pip install numpy
 echo Controls:
 echo Left and Right Arrows - Movement
 echo Down Arrow - Duck
@@ -11,6 +12,7 @@ echo Shift - Strafe
 echo K - Commit Die
 echo F - Fullscreen
 echo P - Show Framerate
+echo H - Show Collision Rects
 echo.
 python3 main.py
 pause
\ No newline at end of file
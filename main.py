@@ -1,190 +1,423 @@
-from os import walk
-import pygame, sys, pytmx
+import argparse, os, pygame, sys, time
+from random import randrange, seed as seed_random
 from pygame import Vector2
-from pytmx.util_pygame import load_pygame
-from code.enemy import Enemy
+from code.atlas import atlas_frames, prepare_atlas
+from code.enemy import Enemy, EnemyManager
 from code.player import Player
+from code.chunk import ChunkedLayer
+from code.level import LevelGroup
+from code.mapdata import MapData, TILE_LAYERS
+from code.parallax import ParallaxLayer
+from code.masks import MASKS
+from code.particles import BloodParticles
+from code.pool import FlashPool
+from code.profiler import PROFILER
+from code.projectiles import Projectiles
+from code.render import RenderQueue
+from code.replay import Recorder, Recording, Replayer
+from code.resources import RESOURCES
 from code.settings import * 
+from code.spatial import SpatialGrid
 from code.sprite import *
 from code.tile import *
 
 # pyright: reportGeneralTypeIssues=false
 
-def object_position(object):
-    return (object.x, object.y)
-
-def import_assets(path):
-    animations = {}
-    for index, folder in enumerate(walk(f'{path}')):
-        if index == 0:
-            for name in folder[1]:
-                animations[name] = []
-        else:
-            for image in sorted(folder[2], key = lambda string: int(string.split('.')[0])):
-                # Replace \s with /s
-                fixed_folder = folder[0].replace('\\','/')
-                # Create path to image
-                path = f"{fixed_folder}/{image}"
-                surf = pygame.image.load(path).convert_alpha();
-                # Find name of folder by taking only what comes after '\'
-                print(fixed_folder)
-                key = fixed_folder.split('/').pop()
-                # Append image to the animations dictionary, using folder name as key
-                animations[key].append(surf)
-    return animations
-
 class AllSprites(pygame.sprite.Group):
 	def __init__(self, width, height):
 		super().__init__()
 		self.offset = Vector2()
-		bg_path = PATHS['bg']
-		fg_path = PATHS['fg']
-		self.bg = pygame.image.load(bg_path).convert_alpha()
-		self.fg = pygame.image.load(fg_path).convert_alpha()
 		self.map_width = width
 		self.map_height = height
-		self.sky_num = self.map_width // self.bg.get_width() + 1
+		## Parallax, the sky back to front and the cloud cover that scrolls with the level, cut into bands once per process
+		self.sky = [RESOURCES.layer(('sky', PATHS['bg']), lambda: ParallaxLayer(RESOURCES.image(PATHS['bg']), (-WINDOW_WIDTH / 2, 850), 2.5)),
+		            RESOURCES.layer(('sky', PATHS['fg']), lambda: ParallaxLayer(RESOURCES.image(PATHS['fg']), (-WINDOW_WIDTH / 2, 850), 2))]
+		self.clouds = RESOURCES.layer(('clouds', PATHS['fg'], self.map_height), lambda: ParallaxLayer(RESOURCES.image(PATHS['fg']), (0, self.map_height - 500), 1))
 		self.layers = len(LAYERS)
+		self.static_layers = [[] for _ in range(self.layers)]
+		self.systems = [[] for _ in range(self.layers)]
+		self.hooks = {}
+		# Sprites a system updates for them, like enemies, are left out of the per sprite update
+		self.updating = {}
+		self.blood = None
+		self.projectiles = None
+		self.flashes = None
+		self.grid = SpatialGrid()
+		self.queue = RenderQueue()
+		self.view_rect = pygame.Rect(0, 0, WINDOW_WIDTH, WINDOW_HEIGHT)
+		## Interpolation between simulation ticks, only needed when something is being drawn
+		self.interpolate = False
+		self.previous = {}
 		pass
+
+	def add_internal(self, sprite, layer = None):
+		super().add_internal(sprite, layer)
+		self.grid.insert(sprite)
+		if not getattr(sprite, 'managed', False):
+			self.updating[sprite] = None
+
+	def remove_internal(self, sprite):
+		super().remove_internal(sprite)
+		self.grid.remove(sprite)
+		self.updating.pop(sprite, None)
+
+	def add_system(self, system, after = None):
+		# Systems given a sprite update right after it instead of after everything, to keep the update order it replaced
+		if after is None:
+			self.systems[system.z].append(system)
+		else:
+			self.hooks.setdefault(after, []).append(system)
+
+	def update_system(self, system, *args, **kwargs):
+		start = PROFILER.start()
+		system.update(*args, **kwargs)
+		if PROFILER.enabled: PROFILER.add(F"update {type(system).__name__}", start)
+
+	def update(self, *args, **kwargs):
+		sprites = list(self.updating)
+		if self.interpolate:
+			self.previous = {sprite: sprite.rect.center for sprite in sprites}
+		profiling = PROFILER.enabled
+		for sprite in sprites:
+			if profiling:
+				# Same as the group update, just timed per sprite class
+				start = PROFILER.start()
+				sprite.update(*args, **kwargs)
+				PROFILER.add(F"update {type(sprite).__name__}", start)
+			else:
+				sprite.update(*args, **kwargs)
+			for system in self.hooks.get(sprite, ()):
+				self.update_system(system, *args, **kwargs)
+		for layer in self.systems:
+			for system in layer:
+				self.update_system(system, *args, **kwargs)
+		# Re-bucket anything that moved so the next draw only looks at what's on screen, managed sprites do it themselves
+		for sprite in self.updating:
+			self.grid.move(sprite)
+
+	def add_static_layer(self, layer):
+		self.static_layers[layer.z].append(layer)
+
+	def interpolated_center(self, sprite, alpha):
+		previous = self.previous.get(sprite)
+		center = sprite.rect.center
+		if previous is None or alpha >= 1:
+			return center
+		# Snap instead of sliding across the map after a teleport like a respawn
+		if abs(center[0] - previous[0]) > INTERPOLATION_SNAP or abs(center[1] - previous[1]) > INTERPOLATION_SNAP:
+			return center
+		return (previous[0] + (center[0] - previous[0]) * alpha, previous[1] + (center[1] - previous[1]) * alpha)
     
-	def customize_draw(self, display_surface, player):
+	def customize_draw(self, display_surface, player, alpha = 1):
 		## Adjust offset based on player position
-		self.offset.x = player.rect.centerx - WINDOW_WIDTH / 2
-		self.offset.y = player.rect.centery - WINDOW_HEIGHT / 2
+		player_center = self.interpolated_center(player, alpha)
+		self.offset.x = player_center[0] - WINDOW_WIDTH / 2
+		self.offset.y = player_center[1] - WINDOW_HEIGHT / 2
 		# Left/Top bounds
 		if (self.offset.x < 0): self.offset.x = 0
 		if (self.offset.y < 0): self.offset.y = 0
 		# Right/Bottom bounds
 		if (self.offset.x + WINDOW_WIDTH > self.map_width): self.offset.x = self.map_width - WINDOW_WIDTH
 		if (self.offset.y + WINDOW_HEIGHT > self.map_height): self.offset.y = self.map_height - WINDOW_HEIGHT
+		# Everything below is queued and submitted in one batch per layer, camera offset included
+		queue = self.queue
+		queue.begin(self.offset)
 		# Draw layered scrolling background
-		for x in range(self.sky_num):
-			bg_pos_x = (-WINDOW_WIDTH / 2) + (x * self.bg.get_width())
-			display_surface.blit(self.bg, (bg_pos_x - self.offset.x / 2.5, 850 - self.offset.y / 2.5))
-			display_surface.blit(self.fg, (bg_pos_x - self.offset.x / 2, 850 - self.offset.y / 2))
-		# Draw Sprites via layers
+		start = PROFILER.start()
+		for index, layer in enumerate(self.sky):
+			layer.draw(queue, self.offset, [closer.cover(self.offset) for closer in self.sky[index + 1:]])
+		queue.submit(display_surface)
+		# Draw Sprites via layers, only looking at the sprites near the camera
+		if PROFILER.enabled: PROFILER.add("draw sky", start)
+		start = PROFILER.start()
+		self.view_rect.topleft = (int(self.offset.x), int(self.offset.y))
+		visible = self.grid.query(self.view_rect.inflate(SPATIAL_VIEW_MARGIN * 2, SPATIAL_VIEW_MARGIN * 2), self.layers)
+		if PROFILER.enabled: PROFILER.add("visibility query", start)
 		for layer in range(0, self.layers):
-			for sprite in [x for x in self.sprites() if x.z == layer]:
-				offset_rect = sprite.image.get_rect(center = sprite.rect.center)
-				offset_rect.center -= self.offset
-				display_surface.blit(sprite.image, offset_rect)
+			start = PROFILER.start()
+			for static_layer in self.static_layers[layer]:
+				static_layer.draw(queue, self.offset)
+			for sprite in visible[layer]:
+				queue.add_centered(sprite.image, self.interpolated_center(sprite, alpha))
+			for system in self.systems[layer]:
+				system.draw(queue, self.offset, alpha)
+			queue.submit(display_surface)
+			if PROFILER.enabled: PROFILER.add(F"draw {LAYER_NAMES[layer]}", start)
 			pass
 		pass
         # Bottom Cloud Cover
-		for x in range(0, (self.map_width // self.fg.get_width()) + 1):
-			display_surface.blit(self.fg, Vector2(x * self.fg.get_width() - self.offset.x, self.map_height - 500 - self.offset.y))
+		start = PROFILER.start()
+		self.clouds.draw(queue, self.offset)
+		queue.submit(display_surface)
+		if PROFILER.enabled: PROFILER.add("draw clouds", start)
 	pass
 
 class Main:
-	def __init__(self):
+	def __init__(self, headless = False, map_path = PATHS['map'], seed = None):
+		# Headless runs go through SDL's dummy drivers, so no window or sound device is needed
+		self.headless = headless
+		# Seeded before anything rolls a number, so a recording can rebuild the same game.
+		# Any integer works, it's wrapped into the 32 bits the blood's generator and a recording's header can take
+		if seed is not None:
+			seed %= 2 ** 32
+			seed_random(seed)
+		self.seed = seed
+		if headless:
+			os.environ['SDL_VIDEODRIVER'] = 'dummy'
+			os.environ['SDL_AUDIODRIVER'] = 'dummy'
 		pygame.init()
 		self.display_surface = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.SCALED)
 		pygame.display.set_caption('Contra')
 		self.clock = pygame.time.Clock()
-		## Music
-		pygame.mixer.music.load("audio/music.ogg")
-		pygame.mixer.music.set_volume(MUSIC_VOLUME)
-		pygame.mixer.music.play(-1)	
-		## HUD
-		self.health_offset = (16, 16)
-		self.health_image = pygame.image.load("graphics/health.png").convert()
 		## Framerate Stuff
 		self.framerate_show = False
 		self.font = pygame.font.Font(None, 24)
 		self.win_font = pygame.font.Font(None, 64)
 		self.framerate_list = []
 		self.framerate_average = 0
-		## Tiled Load
-		tmx_data = load_pygame(f"{PATHS['map']}")
+		self.collision_debug_show = False
+		## Loading, everything below only hits the resource cache
+		map_data = self.load_assets(map_path)
+		## Music
+		pygame.mixer.music.load("audio/music.ogg")
+		pygame.mixer.music.set_volume(MUSIC_VOLUME)
+		pygame.mixer.music.play(-1)	
+		## HUD
+		self.health_offset = (16, 16)
+		self.health_image = RESOURCES.image("graphics/health.png", alpha = False)
+		## Simulation
+		self.ticks = 0
+		self.accumulator = 0
 		self.player = None
+		# Records or replays the input of every tick when set
+		self.input = None
 		## Groups
-		self.all_sprites = AllSprites(tmx_data.width * tmx_data.tilewidth, tmx_data.height * tmx_data.tileheight)
+		self.all_sprites = AllSprites(map_data.width * map_data.tile_width, map_data.height * map_data.tile_height)
 		self.player_group = pygame.sprite.Group()
 		self.enemy_group = pygame.sprite.Group()
-		self.level_group = pygame.sprite.Group()
+		self.level_group = LevelGroup(map_data.width, map_data.height, map_data.tile_width, map_data.tile_height)
 		self.platforms = pygame.sprite.Group()
 		self.platform_border_rects = []
+		self.all_sprites.blood = BloodParticles(self.level_group, self.all_sprites.map_width, self.all_sprites.map_height, seed = seed)
+		self.all_sprites.add_system(self.all_sprites.blood)
 		## Animations
-		player_animations = import_assets(PATHS['player'])
-		enemy_animations = import_assets(PATHS['enemy'])
+		self.player_animations = atlas_frames(*self.atlases['player'])
+		self.enemy_animations = atlas_frames(*self.atlases['enemy'])
   		## Tiles
-		for x, y, surf in tmx_data.get_layer_by_name('Level').tiles():
-			Tile((x * surf.get_width(), y * surf.get_height()), surf, LAYERS['main'], (self.all_sprites, self.level_group))
-		for layer in ['BG', 'BG Detail', 'FG Detail Bottom', 'FG Detail Top']:
-			for x, y, surf in tmx_data.get_layer_by_name(layer).tiles():
-				Tile((x * surf.get_width(), y * surf.get_height()), surf, LAYERS[layer.lower()], (self.all_sprites))
+		# Level tiles only exist as sprites for collision, their graphics are baked below
+		for x, y, surf in map_data.tiles('Level'):
+			Tile((x * surf.get_width(), y * surf.get_height()), surf, LAYERS['main'], (self.level_group))
+		# Baked once per map and process, keyed on the map's sources so an edited map gets baked again
+		for layer in TILE_LAYERS:
+			z = LAYERS['main'] if layer == 'Level' else LAYERS[layer.lower()]
+			self.all_sprites.add_static_layer(RESOURCES.layer((map_data.key, layer), lambda: ChunkedLayer(map_data.tiles(layer), z, self.all_sprites.map_width, self.all_sprites.map_height)))
+		## Collision
+		self.level_group.set_solids(map_data.solids)
 		## Platforms
-		for obj in tmx_data.get_layer_by_name('Platforms'):
-			if obj.name == 'Platform':
-				MovingPlatform(object_position(obj), obj.image, LAYERS['main'], (self.all_sprites, self.level_group, self.platforms), self.platform_border_rects, self.player_group)
-			else: ## Border
-				border_rect = pygame.Rect(obj.x, obj.y, obj.width, obj.height)
-				self.platform_border_rects.append(border_rect)
-				## Entities
-		for obj in tmx_data.get_layer_by_name('Entities'):
-			## Player
-			if obj.name == 'Player':
-				self.player = Player(animations = player_animations,
-                         pos = object_position(obj),
-                         level_group = self.level_group,
-                         death_y = self.all_sprites.map_height,
-                         groups = (self.all_sprites, self.player_group),
-                         enemy_group = self.enemy_group)
-			## Enemies
-			if obj.name == 'Enemy':
-				Enemy(animations = enemy_animations,
-                         pos = object_position(obj),
-                         level_group = self.level_group,
-                         groups = (self.all_sprites, self.enemy_group),
-                         enemy_group = self.player_group)
+		for x, y, gid in map_data.platforms:
+			MovingPlatform((x, y), map_data.image(gid), LAYERS['main'], (self.all_sprites, self.level_group, self.platforms), self.platform_border_rects, self.player_group)
+		for x, y, width, height in map_data.borders:
+			self.platform_border_rects.append(pygame.Rect(x, y, width, height))
+		## Entities
+		self.player = Player(animations = self.player_animations,
+                       pos = map_data.player,
+                       level_group = self.level_group,
+                       death_y = self.all_sprites.map_height,
+                       groups = (self.all_sprites, self.player_group),
+                       enemy_group = self.enemy_group)
+		# Enemies think right after the player moves, like they did when each one updated itself
+		self.enemies = EnemyManager(self.enemy_animations, self.player)
+		self.all_sprites.add_system(self.enemies, after = self.player)
+		for pos in map_data.enemies:
+			Enemy(animations = self.enemy_animations,
+                  pos = pos,
+                  level_group = self.level_group,
+                  groups = (self.all_sprites, self.enemy_group),
+                  enemy_group = self.player_group,
+                  manager = self.enemies)
+		## Projectiles, bullets update after every sprite and before the blood their hits spill
+		self.all_sprites.flashes = FlashPool(self.all_sprites)
+		self.all_sprites.projectiles = Projectiles(self.level_group)
+		self.all_sprites.add_system(self.all_sprites.projectiles)
 		pass
 
+	def load_assets(self, map_path):
+		# Get a loading screen up straight away, then decode every image and sound on worker threads
+		self.draw_loading(0, 1)
+		start = time.perf_counter()
+		## Tiled Load, from the compiled copy of the map
+		map_data = MapData(map_path)
+		map_time = time.perf_counter() - start
+		start = time.perf_counter()
+		self.atlases = {name: prepare_atlas(PATHS[name]) for name in ['player', 'enemy']}
+		atlas_time = time.perf_counter() - start
+		images = [(PATHS['bg'], True), (PATHS['fg'], True), ("graphics/health.png", False), (PATHS['bullet'], True)]
+		images += [(f"{PATHS['fire']}/{name}", True) for name in sorted(os.listdir(PATHS['fire']))]
+		images += [(image_path, True) for image_path, rects in self.atlases.values()]
+		images += [(path, True) for path in map_data.image_paths()]
+		sounds = [f"audio/{name}" for name in sorted(os.listdir("audio")) if name.endswith('.wav')]
+		timings = RESOURCES.preload(images, sounds, self.draw_loading)
+		# Only the game that actually loaded something reports it, later games in the same process get everything from the cache
+		if any(timing['count'] for timing in timings.values()):
+			print(F"Map loaded in {map_time:.3f}s")
+			print(F"Animation atlases loaded in {atlas_time:.3f}s")
+			for kind, timing in timings.items():
+				print(F"{timing['count']} {kind}s loaded in {timing['total']:.3f}s ({timing['decode']:.3f}s decoding over {LOADING_THREADS} threads, {timing['convert']:.3f}s converting)")
+		return map_data
+
+	def draw_loading(self, done, total):
+		if self.headless:
+			return
+		pygame.event.pump()
+		self.display_surface.fill((249,131,103))
+		loadtext = self.win_font.render("LOADING", True, 'white')
+		self.display_surface.blit(loadtext, loadtext.get_rect(center = (WINDOW_WIDTH / 2, WINDOW_HEIGHT / 2 - 32)))
+		bar = pygame.Rect(0, 0, LOADING_BAR_SIZE[0], LOADING_BAR_SIZE[1])
+		bar.center = (WINDOW_WIDTH / 2, WINDOW_HEIGHT / 2 + 32)
+		self.display_surface.fill('white', (bar.left, bar.top, bar.width * done // total, bar.height))
+		pygame.draw.rect(self.display_surface, 'white', bar, 2)
+		pygame.display.update()
+
+	def handle_events(self):
+		for event in pygame.event.get():
+			if event.type == pygame.QUIT:
+				if self.input: self.input.close()
+				pygame.quit()
+				sys.exit()
+			if event.type == pygame.KEYDOWN:
+				if event.key == PLAYER_FULLSCREEN_KEY:
+					pygame.display.toggle_fullscreen()
+				if event.key == PLAYER_FRAMERATE_KEY:
+					# Cycles between hidden, the FPS counter, and the FPS counter with the profiler
+					if not self.framerate_show:
+						self.framerate_show = True
+					elif not PROFILER.enabled:
+						PROFILER.enabled = True
+					else:
+						self.framerate_show = PROFILER.enabled = False
+						PROFILER.reset()
+				if event.key == PLAYER_COLLISION_DEBUG_KEY:
+					self.collision_debug_show = not self.collision_debug_show
+
+	def enemies_alive(self):
+		return self.enemies.alive
+
+	def step(self):
+		if self.input: self.input.sample()
+		self.all_sprites.update(TICK_TIME)
+		self.ticks += 1
+		if self.input: self.input.check()
+
+	def draw(self, alpha = 1):
+		self.display_surface.fill((249,131,103))
+
+		self.all_sprites.queue.measure = self.framerate_show
+		self.all_sprites.customize_draw(self.display_surface, self.player, alpha)
+		if self.collision_debug_show:
+			self.level_group.draw_debug(self.display_surface, self.all_sprites.offset)
+
+		start = PROFILER.start()
+		## Show Health
+		for x in range(0, self.player.health):
+			self.display_surface.blit(self.health_image, Vector2(self.health_offset) + Vector2(x * self.health_offset[0], 0))
+
+		## Show FPS
+		if (self.framerate_show):
+			fpstext = self.font.render(F"{round(self.framerate_average)} FPS", True, 'white')
+			self.display_surface.blit(fpstext, fpstext.get_rect(topright = (WINDOW_WIDTH - 10, 10)))
+			masktext = self.font.render(F"Mask cache {MASKS.hit_rate('mask'):.0%} / Flip {MASKS.hit_rate('flip'):.0%} / Scale {MASKS.hit_rate('scale'):.0%} / Opaque {MASKS.fast_path}", True, 'white')
+			self.display_surface.blit(masktext, masktext.get_rect(topright = (WINDOW_WIDTH - 10, 30)))
+			assets = RESOURCES.stats()
+			assettext = self.font.render(F"Images {assets['image']['loads']} ({assets['image']['bytes'] // 1024} KB) / Sounds {assets['sound']['loads']} ({assets['sound']['bytes'] // 1024} KB)", True, 'white')
+			self.display_surface.blit(assettext, assettext.get_rect(topright = (WINDOW_WIDTH - 10, 50)))
+			enemies = self.enemies.stats()
+			enemytext = self.font.render(F"Enemies {enemies['alive']} alive / {enemies['awake']} awake / {enemies['asleep']} asleep", True, 'white')
+			self.display_surface.blit(enemytext, enemytext.get_rect(topright = (WINDOW_WIDTH - 10, 70)))
+			render = self.all_sprites.queue.stats
+			rendertext = self.font.render(F"Draw calls {render['draw calls']} / Blits {render['blits']} / Fill {render['pixels'] / (WINDOW_WIDTH * WINDOW_HEIGHT):.2f} screens", True, 'white')
+			self.display_surface.blit(rendertext, rendertext.get_rect(topright = (WINDOW_WIDTH - 10, 90)))
+			if PROFILER.enabled:
+				PROFILER.draw(self.display_surface, self.font, self.sprite_counts(), (WINDOW_WIDTH - 10, 110))
+
+		## Win Screen
+		if not self.enemies_alive():
+			wintext = self.win_font.render("U R DA CONTRA", True, 'white')
+			wintext2 = self.win_font.render("U WIN", True, 'white')
+			self.display_surface.blit(wintext, wintext.get_rect(center = (WINDOW_WIDTH / 2, WINDOW_HEIGHT / 2 - 32)))
+			self.display_surface.blit(wintext2, wintext2.get_rect(center = (WINDOW_WIDTH / 2, WINDOW_HEIGHT / 2 + 32)))
+		if PROFILER.enabled: PROFILER.add("draw hud", start)
+
+	def sprite_counts(self):
+		return {'Sprites': len(self.all_sprites),
+		        'Level tiles': len(self.level_group),
+		        'Platforms': len(self.platforms),
+		        'Enemies': len(self.enemy_group),
+		        'Bullets': len(self.all_sprites.projectiles),
+		        'Blood particles': len(self.all_sprites.blood)}
+
 	def run(self):
+		self.all_sprites.interpolate = True
 		while True:
-			for event in pygame.event.get():
-				if event.type == pygame.QUIT:
-					pygame.quit()
-					sys.exit()
-				if event.type == pygame.KEYDOWN:
-					if event.key == PLAYER_FULLSCREEN_KEY:
-						pygame.display.toggle_fullscreen()
-					if event.key == PLAYER_FRAMERATE_KEY:
-						self.framerate_show = not self.framerate_show
-
-			dt = self.clock.tick(FRAMERATE) / 1000
-   
+			PROFILER.begin_frame()
+			start = PROFILER.start()
+			self.handle_events()
+			if PROFILER.enabled: PROFILER.add("events", start)
+
+			start = PROFILER.start()
+			frame_time = self.clock.tick(FRAMERATE) / 1000
+			if PROFILER.enabled: PROFILER.add("idle", start)
+
 			## Framerate Calculation
 			self.framerate_list.append(round(self.clock.get_fps()))
 			if (len(self.framerate_list) > FRAMERATE):
-				self.framerate_average = sum(self.framerate_list) / len(self.framerate_list)  
+				self.framerate_average = sum(self.framerate_list) / len(self.framerate_list)
 				self.framerate_list = []
-   
-			self.display_surface.fill((249,131,103))
-   
-			self.all_sprites.customize_draw(self.display_surface, self.player)
-			self.all_sprites.update(dt)
-   
-			## Show Health
-			for x in range(0, self.player.health):
-				self.display_surface.blit(self.health_image, Vector2(self.health_offset) + Vector2(x * self.health_offset[0], 0))
-   
-			## Show FPS
-			if (self.framerate_show):
-				fpstext = self.font.render(F"{round(self.framerate_average)} FPS", True, 'white')
-				self.display_surface.blit(fpstext, fpstext.get_rect(topright = (WINDOW_WIDTH - 10, 10)))
-    
-			## Win Screen
-			deaths = 0
-			for enemy in self.enemy_group.sprites():
-				deaths += not enemy.dead
-			if not deaths:
-				wintext = self.win_font.render("U R DA CONTRA", True, 'white')
-				wintext2 = self.win_font.render("U WIN", True, 'white')
-				self.display_surface.blit(wintext, wintext.get_rect(center = (WINDOW_WIDTH / 2, WINDOW_HEIGHT / 2 - 32)))
-				self.display_surface.blit(wintext2, wintext2.get_rect(center = (WINDOW_WIDTH / 2, WINDOW_HEIGHT / 2 + 32)))
 
+			## Fixed Timestep, capped so a long hitch doesn't make the simulation spiral
+			self.accumulator += min(frame_time, MAX_FRAME_TIME)
+			while self.accumulator >= TICK_TIME:
+				self.step()
+				self.accumulator -= TICK_TIME
+
+			self.draw(self.accumulator / TICK_TIME)
+			start = PROFILER.start()
 			pygame.display.update()
+			if PROFILER.enabled: PROFILER.add("display update", start)
+			PROFILER.end_frame()
+
+	def run_headless(self, ticks):
+		start = time.perf_counter()
+		for _ in range(ticks):
+			self.step()
+		elapsed = time.perf_counter() - start
+		if self.input: self.input.close()
+		print(F"{ticks} ticks in {elapsed:.2f}s ({ticks / TICK_RATE / elapsed:.1f}x real time)")
 
 if __name__ == '__main__':
-	main = Main()
-	main.run()
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--headless', action = 'store_true', help = "simulate without a window or sound, as fast as possible")
+	parser.add_argument('--ticks', type = int, default = TICK_RATE * 60, help = "number of ticks to simulate when headless")
+	parser.add_argument('--seed', type = int, help = "seed for everything random in the game")
+	parser.add_argument('--record', help = "record the input of every tick to this file")
+	parser.add_argument('--replay', help = "play back a recording, as fast as possible when headless")
+	args = parser.parse_args()
+	if args.replay:
+		recording = Recording.load(args.replay)
+		changed = recording.changed_settings()
+		if changed:
+			print(F"Settings changed since the recording: {', '.join(changed)}")
+		main = Main(args.headless, recording.map_path, recording.seed)
+		main.input = Replayer(main, recording)
+		if args.headless:
+			main.run_headless(len(recording))
+			sys.exit(1 if main.input.diverged is not None else 0)
+	else:
+		# Recordings always get a seed, picked here if none was given
+		seed = args.seed if args.seed is not None or not args.record else randrange(2 ** 32)
+		main = Main(args.headless, seed = seed)
+		if args.record:
+			main.input = Recorder(main, args.record, Recording(main.seed, PATHS['map']))
+	if args.headless:
+		main.run_headless(args.ticks)
+	else:
+		main.run()